@@ -1,2 +1,10 @@
 from components.button import ButtonMenu
-from components.music_player import MusicPlayer
\ No newline at end of file
+from components.audio_source import AudioSource, LiveAudioSource
+from components.band_layout import BandLayout
+from components.dirty_regions import DirtyRegions
+from components.frame_scheduler import FrameScheduler
+from components.input_dispatcher import InputDispatcher
+from components.music_player import MusicPlayer
+from components.playlist_index import PlaylistIndex
+from components.quality_governor import QualityGovernor
+from components.startup_timer import StartupTimer
\ No newline at end of file
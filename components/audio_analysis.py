@@ -0,0 +1,305 @@
+import numpy as np
+import soundfile
+from components.band_layout import BandLayout
+
+'''
+Audio analysis pipeline used by the MusicPlayer.
+Everything here is module level and picklable so it can also run inside a worker process.
+
+librosa is only imported by the functions that decode or transform audio. Its first STFT pays
+for loading scipy and compiling numba code, so nothing on the way to the first frame touches it.
+Processes that are going to analyze call warm_up() ahead of time instead.
+'''
+
+N_FFT = 2048
+HOP_LENGTH = 512
+SAMPLE_RATE = 22050
+MIN_DECIBEL = -80 # amplitude_to_db clips everything below max - 80dB
+MAX_DECIBEL = 0
+
+# Storage types for the band arrays. uint8 maps MIN_DECIBEL..MAX_DECIBEL onto 0..255
+DTYPES = ("float32", "float16", "uint8")
+
+# Onset detection. A band has an onset where its level is ONSET_RISE dB above the loudest of its
+# previous ONSET_LAG frames, and the rise is the largest within ONSET_SPACING frames either side.
+# Comparing against several frames instead of one ignores the frame to frame flicker of noise.
+# Bands quieter than ONSET_FLOOR never have onsets.
+ONSET_RISE = 9
+ONSET_LAG = 3
+ONSET_SPACING = 3
+ONSET_FLOOR = MIN_DECIBEL + 20
+
+# How audio is decoded before the STFT
+#   RESAMPLE: resample to sample_rate with librosa's default high quality resampler
+#   FAST: resample to sample_rate with a quick low quality resampler
+#   DECIMATE: keep every n-th sample (averaged) for the integer n that gets closest to sample_rate
+#   NATIVE: no resampling at all
+DECODE_MODES = ("RESAMPLE", "FAST", "DECIMATE", "NATIVE")
+
+class AnalysisSettings:
+    """
+    Parameters of the analysis pipeline. Anything that changes the result belongs in key().
+
+    Args:
+        layout (BandLayout): Bands to reduce the spectrogram to, in bar order. Default layout if None.
+        dtype (str): One of DTYPES, the type the bands are stored as.
+        decode (str): One of DECODE_MODES.
+
+    n_fft and hop_length are for sample_rate. Audio decoded at another rate uses proportionally
+    scaled sizes (see get_stft_size), so frames always cover the same duration and bandwidth.
+    """
+    def __init__(self, n_fft=N_FFT, hop_length=HOP_LENGTH, sample_rate=SAMPLE_RATE, layout=None, dtype="float16", decode="RESAMPLE"):
+        if decode not in DECODE_MODES:
+            raise ValueError(f"Unknown decode mode {decode}, expected one of {DECODE_MODES}")
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.sample_rate = sample_rate
+        self.layout = layout or BandLayout()
+        self.dtype = dtype
+        self.decode = decode
+
+    def key(self):
+        return (f"n_fft={self.n_fft},hop={self.hop_length},sr={self.sample_rate},dtype={self.dtype},"
+                f"decode={self.decode},layout={self.layout.key()},"
+                f"onsets={ONSET_RISE}:{ONSET_LAG}:{ONSET_SPACING}:{ONSET_FLOOR}")
+
+    def get_nbytes(self, duration):
+        """
+        Estimate the stored size of the bands of duration seconds of audio. Onsets add a few percent on top.
+        """
+        frames = int(duration * self.sample_rate / self.hop_length) + 1
+        return frames * self.layout.bands * np.dtype(self.dtype).itemsize
+
+    def get_stft_size(self, sample_rate):
+        """
+        Return the (n_fft, hop_length) to use for audio at sample_rate.
+        """
+        scale = sample_rate / self.sample_rate
+        return round(self.n_fft * scale), max(1, round(self.hop_length * scale))
+
+class Analysis:
+    """
+    Band levels and timing information of a single track.
+
+    Args:
+        path (str): Path of the analyzed audio file.
+        bands (np.ndarray): Time-major (frames x bands) decibel levels, quantized if uint8.
+        sample_rate (int): Sample rate the audio was decoded at.
+        freqs (list): Frequency (Hz) of every band column.
+        onsets (tuple): Frame, band and strength arrays of every onset sorted by frame (see find_onsets), None for no onsets.
+    """
+    def __init__(self, path, bands, sample_rate, n_fft, hop_length, freqs, onsets=None):
+        self.path = path
+        self.bands = bands
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.freqs = freqs
+        self.__columns = {freq: i for i, freq in enumerate(freqs)}
+        self.onset_frames, self.onset_bands, self.onset_strengths = onsets or find_onsets(np.zeros((0, len(freqs))))
+
+        # Same as len(times) / times[-1] with times = librosa.frames_to_time(np.arange(frames), n_fft=n_fft)
+        frames = len(bands)
+        last_time = ((frames - 1) * hop_length + n_fft // 2) / sample_rate
+        self.length = round(last_time, 2) * 1000
+        self.time_index_ratio = frames / last_time
+
+    def get_frame(self, target_time, interpolate=False):
+        """
+        Get the decibel level of every band at a specific time (seconds).
+        Times outside the track are clamped to its first or last frame.
+        With interpolate, times between two frames blend them linearly.
+        """
+        position = min(max(target_time * self.time_index_ratio, 0), len(self.bands) - 1)
+        frame = int(position)
+        if not interpolate or frame == len(self.bands) - 1:
+            return dequantize(self.bands[frame])
+
+        current, following = dequantize(self.bands[frame:frame + 2]).astype(np.float32, copy=False)
+        return current + (following - current) * (position - frame)
+
+    def get_decibel(self, target_time, freq):
+        """
+        Get the decibel level at a specific time (seconds) and band frequency (Hz).
+        """
+        return self.get_frame(target_time)[self.__columns[float(freq)]]
+
+    def get_onsets(self, start_time, end_time):
+        """
+        Get the onsets after start_time up to and including end_time (seconds), with two binary searches.
+
+        Returns:
+            tuple: Band index and strength (dB) arrays of the onsets, empty if end_time isn't after start_time.
+        """
+        first, last = np.searchsorted(self.onset_frames, [start_time * self.time_index_ratio,
+                                                          end_time * self.time_index_ratio], side="right")
+        if last <= first:
+            return self.onset_bands[:0], self.onset_strengths[:0]
+        return self.onset_bands[first:last], self.onset_strengths[first:last]
+
+    def close(self):
+        """
+        Called when the player switches away from this analysis. Nothing to release for a full analysis.
+        """
+
+    def get_arrays(self):
+        """
+        Return the NumPy arrays of the analysis by name. Used to store or transfer it.
+        """
+        return {"bands": self.bands, "onset_frames": self.onset_frames,
+                "onset_bands": self.onset_bands, "onset_strengths": self.onset_strengths}
+
+    def get_metadata(self):
+        """
+        Return everything besides the arrays that is needed to rebuild the analysis.
+        """
+        return {"path": self.path, "sample_rate": self.sample_rate, "n_fft": self.n_fft,
+                "hop_length": self.hop_length, "freqs": self.freqs}
+
+    @classmethod
+    def from_arrays(cls, arrays, metadata):
+        """
+        Rebuild an analysis from the output of get_arrays() and get_metadata().
+        """
+        onsets = arrays["onset_frames"], arrays["onset_bands"], arrays["onset_strengths"]
+        return cls(metadata["path"], arrays["bands"], metadata["sample_rate"], metadata["n_fft"],
+                   metadata["hop_length"], metadata["freqs"], onsets)
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.get_arrays().values())
+
+def quantize(decibels, dtype):
+    """
+    Convert float decibels to the storage dtype. uint8 spreads MIN_DECIBEL..MAX_DECIBEL over 0..255.
+    """
+    if dtype == "uint8":
+        scaled = (decibels - MIN_DECIBEL) * (255 / (MAX_DECIBEL - MIN_DECIBEL))
+        return np.clip(np.rint(scaled), 0, 255).astype(np.uint8)
+    return decibels.astype(dtype)
+
+def dequantize(levels):
+    """
+    Convert stored band levels back to float decibels. Works on scalars and arrays.
+    """
+    if getattr(levels, "dtype", None) == np.uint8:
+        return levels * ((MAX_DECIBEL - MIN_DECIBEL) / 255) + MIN_DECIBEL
+    return levels
+
+def to_band_decibels(magnitudes, filterbank, ref):
+    """
+    Reduce STFT magnitudes (bins x frames) to bands with a single matrix multiply and convert them to decibels.
+
+    Returns:
+        np.ndarray: Contiguous time-major (frames x bands) decibels, so one frame is one row.
+    """
+    amplitudes = magnitudes.T @ filterbank.T
+
+    # Same as librosa.amplitude_to_db(amplitudes, ref=ref, top_db=None), without importing librosa on the render thread
+    decibels = 20 * np.log10(np.maximum(amplitudes, 1e-5)) - 20 * np.log10(max(ref, 1e-5))
+    return np.maximum(decibels, MIN_DECIBEL)
+
+def find_onsets(decibels):
+    """
+    Find the frames where a band suddenly gets louder.
+
+    Args:
+        decibels (np.ndarray): Time-major (frames x bands) decibel levels.
+
+    Returns:
+        tuple: Frame (int32), band (int16) and strength (float16, the rise in dB) of every onset, sorted by frame.
+    """
+    from scipy.ndimage import maximum_filter1d
+
+    decibels = np.asarray(decibels, dtype=np.float32)
+    frames = len(decibels)
+
+    # Loudest level of the ONSET_LAG frames before each frame, the first frame repeats before the start
+    padded = np.concatenate([np.repeat(decibels[:1], ONSET_LAG, axis=0), decibels])
+    previous = padded[:frames].copy()
+    for lag in range(1, ONSET_LAG):
+        np.maximum(previous, padded[lag:lag + frames], out=previous)
+
+    rise = np.maximum(decibels - previous, 0)
+    peaks = maximum_filter1d(rise, 2 * ONSET_SPACING + 1, axis=0, mode="nearest")
+    is_onset = (rise > ONSET_RISE) & (rise == peaks) & (decibels > ONSET_FLOOR)
+
+    frames, bands = np.nonzero(is_onset) # Row major, so already sorted by frame
+    return frames.astype(np.int32), bands.astype(np.int16), rise[frames, bands].astype(np.float16)
+
+def get_duration(path):
+    """
+    Return the duration of an audio file in seconds from its header, or None if it can't be read without decoding.
+    """
+    try:
+        return soundfile.info(path).duration
+    except RuntimeError:
+        pass
+
+    # Formats soundfile can't open, librosa falls back to its other decoders
+    try:
+        import librosa
+        return librosa.get_duration(path=path)
+    except Exception:
+        return None
+
+def warm_up():
+    """
+    Import librosa and run a tiny STFT, so the first real analysis in this process doesn't pay for it.
+    """
+    import librosa
+    librosa.stft(np.zeros(N_FFT * 2, dtype=np.float32), n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+def decode(path, settings):
+    """
+    Decode an audio file to mono as set by settings.decode.
+
+    Returns:
+        tuple: The samples and their sample rate.
+    """
+    import librosa
+    if settings.decode == "RESAMPLE":
+        return librosa.load(path, sr=settings.sample_rate)
+    if settings.decode == "FAST":
+        return librosa.load(path, sr=settings.sample_rate, res_type="soxr_qq")
+
+    time_series, sample_rate = librosa.load(path, sr=None)
+    factor = max(1, round(sample_rate / settings.sample_rate))
+    if settings.decode == "DECIMATE" and factor > 1:
+        # Averaging each group of samples doubles as a cheap low pass filter
+        time_series = time_series[:len(time_series) // factor * factor]
+        time_series = sum(time_series[i::factor] for i in range(factor)) / factor
+        sample_rate = sample_rate / factor
+    return time_series, sample_rate
+
+def analyze_track(path, settings=None):
+    """
+    Load and process the audio data of a track for visualization.
+
+    Computes the Short-Time Fourier Transform (STFT) of the audio signal,
+    reduces it to the bands of the layout and converts them to decibels.
+
+    Args:
+        path (str): Path of the audio file.
+        settings (AnalysisSettings): Analysis parameters, defaults if None.
+
+    Returns:
+        Analysis: The band levels and timing information of the track.
+    """
+    import librosa
+    settings = settings or AnalysisSettings()
+
+    # time_series: A NumPy array representing the audio signal (amplitude values over time).
+    # sample_rate: The number of samples (data points) per second (Hz).
+    time_series, sample_rate = decode(path, settings)
+    n_fft, hop_length = settings.get_stft_size(sample_rate)
+
+    # Compute STFT to get amplitude values
+    stft = np.abs(librosa.stft(time_series, hop_length=hop_length, n_fft=n_fft))
+
+    # Reduce to the bands the visualizer reads and convert amplitude to decibels, relative to the loudest bin
+    filterbank = settings.layout.filterbank(sample_rate, n_fft)
+    decibels = to_band_decibels(stft, filterbank, ref=stft.max(initial=1e-10))
+
+    # Onsets come from the full precision levels, before they are quantized for storage
+    return Analysis(path, quantize(decibels, settings.dtype), sample_rate, n_fft, hop_length,
+                    settings.layout.freqs, find_onsets(decibels))
@@ -0,0 +1,235 @@
+import threading
+import time
+import numpy as np
+import soundfile
+from components import audio_analysis
+
+'''
+AudioSource is what the render loop reads band levels from.
+
+MusicPlayer is the source for files it can analyze up front. LiveAudioSource visualizes a stream
+as it arrives, for live input or anything whose duration isn't known. Controls that don't apply
+to a source (changing songs on a live stream) do nothing.
+'''
+class AudioSource:
+    is_paused = False
+
+    def update(self):
+        """
+        Called once per frame before anything is read
+        """
+
+    def get_frame(self, target_time):
+        """
+        Return the decibel level of every band at target_time (seconds)
+        """
+        raise NotImplementedError
+
+    def get_current_time(self):
+        """
+        Return the current position in milliseconds
+        """
+        raise NotImplementedError
+
+    def get_onsets(self, start_time, end_time):
+        """
+        Return the band index and strength (dB) arrays of the onsets after start_time up to end_time (seconds)
+        """
+        return np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.float16)
+
+    def get_length(self):
+        """
+        Return the length in milliseconds, infinite if unknown
+        """
+        return float('inf')
+
+    def next(self): pass
+    def prev(self): pass
+    def fast_forward(self, seconds=5): pass
+    def rewind(self, seconds=5): pass
+    def pause(self): pass
+    def close(self): pass
+
+'''
+Fixed size ring buffer of samples for one writer thread and one reader thread, without locks.
+
+The writer copies samples in and only then advances the write counter, so the reader never
+sees a position that isn't written yet. A reader that falls a whole buffer behind can detect it
+because the counter only ever grows.
+
+Args:
+        capacity: number of samples kept
+'''
+class RingBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.__samples = np.zeros(capacity, dtype=np.float32)
+        self.written = 0 # Total number of samples ever written
+
+    def write(self, samples):
+        samples = samples[-self.capacity:]
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.__samples[start:start + first] = samples[:first]
+        self.__samples[:len(samples) - first] = samples[first:]
+        self.written += len(samples) # Publish only after the copy
+
+    def read_latest(self, count, out):
+        """
+        Copy the newest count samples into out.
+
+        Returns:
+            bool: False if fewer than count samples were written or the writer lapped the reader during the copy.
+        """
+        end = self.written
+        if end < count:
+            return False
+        start = (end - count) % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.__samples[start:start + first]
+        out[first:] = self.__samples[:count - first]
+        return self.written - end <= self.capacity - count
+
+'''
+LiveAudioSource visualizes a stream of samples in real time.
+
+A producer thread pulls blocks from the stream into a RingBuffer. An analysis thread computes
+a windowed FFT of the newest n_fft samples every hop_length samples, reduces it to the bands of
+the layout and publishes the result, which get_frame() returns. Latency is bounded by the
+window plus one hop. Onsets are detected as the frames arrive and collected until get_onsets().
+
+Args:
+        blocks: iterable of mono float sample blocks, e.g. file_blocks() or a generator
+        sample_rate: sample rate of the blocks
+        layout: BandLayout to reduce to, the default layout if None
+        paced: whether to play blocks at real time speed. Use False for sources that already block until audio arrives.
+        settings: AnalysisSettings with the layout, FFT size and hop (scaled to sample_rate). Overrides layout if given.
+'''
+class LiveAudioSource(AudioSource):
+    def __init__(self, blocks, sample_rate, layout=None, paced=True, settings=None):
+        settings = settings or audio_analysis.AnalysisSettings(layout=layout)
+        self.sample_rate = sample_rate
+        self.n_fft, self.hop_length = settings.get_stft_size(sample_rate)
+        self.is_paused = False
+        self.__filterbank = settings.layout.filterbank(sample_rate, self.n_fft)
+        self.__window = np.hanning(self.n_fft).astype(np.float32)
+        self.__peak = 1e-10 # Slowly decaying loudest magnitude, the reference for 0dB
+        self.__latest = np.full(settings.layout.bands, audio_analysis.MIN_DECIBEL, dtype=np.float32)
+        self.__history = np.repeat(self.__latest[np.newaxis], audio_analysis.ONSET_LAG, axis=0) # Previous frames, oldest first
+        self.__quiet_frames = np.zeros(settings.layout.bands, dtype=np.int32) # Frames since each band's last onset
+        self.__onsets = np.zeros(settings.layout.bands, dtype=np.float32) # Strongest onset per band since get_onsets()
+        self.__onsets_lock = threading.Lock() # Both threads replace __onsets, without it onsets can be lost in between
+        self.__ring = RingBuffer(max(4 * self.n_fft, sample_rate))
+        self.__start_time = time.perf_counter()
+        self.__stopped = threading.Event()
+
+        self.__threads = [threading.Thread(target=self.__produce, args=(blocks, paced), daemon=True),
+                          threading.Thread(target=self.__analyze, daemon=True)]
+        for thread in self.__threads:
+            thread.start()
+
+    @classmethod
+    def from_file(cls, path, layout=None, loop=True):
+        """
+        Stand-in for live input that streams an audio file at real time speed
+        """
+        return cls(file_blocks(path, loop=loop), soundfile.info(path).samplerate, layout)
+
+    @classmethod
+    def from_microphone(cls, layout=None, sample_rate=44100):
+        """
+        Visualize the default input device. Needs the optional sounddevice package.
+        """
+        return cls(microphone_blocks(sample_rate), sample_rate, layout, paced=False)
+
+    def get_frame(self, target_time):
+        """
+        Return the newest band levels. Live input has no past or future, so target_time is ignored.
+        """
+        return self.__latest
+
+    def get_current_time(self):
+        return (time.perf_counter() - self.__start_time) * 1000
+
+    def get_onsets(self, start_time, end_time):
+        """
+        Return the onsets detected since the last call, the times are ignored like in get_frame().
+        """
+        with self.__onsets_lock:
+            onsets, self.__onsets = self.__onsets, np.zeros_like(self.__onsets)
+        bands = np.flatnonzero(onsets)
+        return bands.astype(np.int16), onsets[bands].astype(np.float16)
+
+    def pause(self):
+        """
+        Freeze the bars. The stream keeps being read so nothing piles up.
+        """
+        self.is_paused = not self.is_paused
+
+    def close(self):
+        self.__stopped.set()
+        for thread in self.__threads:
+            thread.join(timeout=1)
+
+    def __produce(self, blocks, paced):
+        written = 0
+        start = time.perf_counter()
+        for block in blocks:
+            if self.__stopped.is_set():
+                break
+            self.__ring.write(np.asarray(block, dtype=np.float32))
+            written += len(block)
+
+            # Don't get ahead of the wall clock
+            if paced:
+                ahead = written / self.sample_rate - (time.perf_counter() - start)
+                if ahead > 0:
+                    self.__stopped.wait(ahead)
+
+    def __analyze(self):
+        samples = np.zeros(self.n_fft, dtype=np.float32)
+        period = self.hop_length / self.sample_rate
+        while not self.__stopped.wait(period):
+            if self.is_paused or not self.__ring.read_latest(self.n_fft, samples):
+                continue
+            magnitudes = np.abs(np.fft.rfft(samples * self.__window))[:, np.newaxis]
+            self.__peak = max(self.__peak * 0.999, float(magnitudes.max()))
+            self.__latest = audio_analysis.to_band_decibels(magnitudes, self.__filterbank, ref=self.__peak)[0]
+            self.__detect_onsets(self.__latest)
+
+    def __detect_onsets(self, decibels):
+        """
+        Live version of audio_analysis.find_onsets. Without future frames to compare against,
+        a band that just had an onset can't have another for ONSET_SPACING frames instead.
+        """
+        rise = decibels - self.__history.max(axis=0)
+        is_onset = ((rise > audio_analysis.ONSET_RISE) & (decibels > audio_analysis.ONSET_FLOOR) &
+                    (self.__quiet_frames >= audio_analysis.ONSET_SPACING))
+        self.__quiet_frames = np.where(is_onset, 0, self.__quiet_frames + 1)
+        with self.__onsets_lock:
+            self.__onsets = np.where(is_onset, np.maximum(self.__onsets, rise), self.__onsets)
+        self.__history = np.vstack([self.__history[1:], decibels])
+
+def file_blocks(path, block_size=1024, loop=True):
+    """
+    Yield mono blocks of an audio file, from the start again once it ends if loop is True.
+    """
+    while True:
+        for block in soundfile.blocks(path, blocksize=block_size, dtype="float32", always_2d=True):
+            yield block.mean(axis=1)
+        if not loop:
+            return
+
+def microphone_blocks(sample_rate=44100, block_size=1024):
+    """
+    Yield mono blocks from the default input device as they are recorded.
+    """
+    try:
+        import sounddevice
+    except ImportError:
+        raise ImportError("Live microphone input needs the sounddevice package: pip install sounddevice")
+
+    with sounddevice.InputStream(samplerate=sample_rate, blocksize=block_size, channels=1, dtype="float32") as stream:
+        while True:
+            block, _ = stream.read(block_size)
+            yield block[:, 0]
@@ -0,0 +1,101 @@
+import numpy as np
+
+'''
+BandLayout class decides which frequencies each bar shows.
+
+Every band aggregates a range of FFT bins. The weights of all bands form a filterbank matrix
+(bands x bins) that is built once per sample rate and FFT size, so reducing a spectrogram to
+bands is a single matrix multiply no matter how many bins a band covers.
+
+Args:
+        kind: one of KINDS
+            LINEAR: equally wide bands
+            LOG: bands with equal frequency ratios, more detail in the bass
+            OCTAVE: fractional octave bands centered on 1 kHz, bands_per_octave of them per octave
+            MEL: overlapping triangular bands spaced evenly on the mel scale
+        bands: number of bands, ignored for OCTAVE
+        min_freq, max_freq: frequency range covered in Hz
+        bands_per_octave: band width of OCTAVE layouts, 3 for third octaves
+'''
+class BandLayout:
+    KINDS = ("LINEAR", "LOG", "OCTAVE", "MEL")
+
+    def __init__(self, kind="LINEAR", bands=156, min_freq=200, max_freq=8000, bands_per_octave=3):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown band layout {kind}, expected one of {self.KINDS}")
+        self.kind = kind
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.bands_per_octave = bands_per_octave
+        self.__edges = self.__get_edges(bands)
+        self.bands = len(self.__edges) - 2 if kind == "MEL" else len(self.__edges) - 1
+        self.__filterbanks = {}
+
+        # Center frequency of each band. Bars and get_decibel refer to bands by these
+        if kind == "LINEAR":
+            centers = (self.__edges[:-1] + self.__edges[1:]) / 2
+        elif kind == "MEL":
+            centers = self.__edges[1:-1]
+        else:
+            centers = np.sqrt(self.__edges[:-1] * self.__edges[1:])
+        self.freqs = [round(float(freq), 2) for freq in centers]
+
+    def key(self):
+        return f"{self.kind}:{self.bands}:{self.min_freq:g}-{self.max_freq:g}:{self.bands_per_octave}"
+
+    def __get_edges(self, bands):
+        """
+        Return the band edges in Hz. MEL edges overlap: band i rises from edge i, peaks at i+1 and falls to i+2.
+        """
+        if self.kind == "LINEAR":
+            return np.linspace(self.min_freq, self.max_freq, bands + 1)
+        if self.kind == "LOG":
+            return np.geomspace(self.min_freq, self.max_freq, bands + 1)
+        if self.kind == "OCTAVE":
+            # Band k is centered on 1000 * 2^(k / bands_per_octave), like the standard octave band series
+            first = int(np.ceil(np.log2(self.min_freq / 1000) * self.bands_per_octave))
+            last = int(np.floor(np.log2(self.max_freq / 1000) * self.bands_per_octave))
+            centers = 1000 * 2.0 ** (np.arange(first, last + 1) / self.bands_per_octave)
+            return np.append(centers, centers[-1] * 2.0 ** (1 / self.bands_per_octave)) * 2.0 ** (-1 / (2 * self.bands_per_octave))
+        mels = np.linspace(_hz_to_mel(self.min_freq), _hz_to_mel(self.max_freq), bands + 2)
+        return _mel_to_hz(mels)
+
+    def filterbank(self, sample_rate, n_fft):
+        """
+        Return the (bands x bins) weight matrix for an STFT of n_fft at sample_rate. Each row sums to 1,
+        so multiplying it with the magnitudes gives the average magnitude of every band.
+        """
+        key = (sample_rate, n_fft)
+        if key not in self.__filterbanks:
+            self.__filterbanks[key] = self.__build_filterbank(sample_rate, n_fft)
+        return self.__filterbanks[key]
+
+    def __build_filterbank(self, sample_rate, n_fft):
+        bin_freqs = np.linspace(0, sample_rate / 2, n_fft // 2 + 1)
+        weights = np.zeros((self.bands, len(bin_freqs)), dtype=np.float32)
+
+        for band in range(self.bands):
+            if self.kind == "MEL":
+                low, center, high = self.__edges[band:band + 3]
+                rising = (bin_freqs - low) / (center - low)
+                falling = (high - bin_freqs) / (high - center)
+                weights[band] = np.maximum(0, np.minimum(rising, falling))
+            else:
+                low, high = self.__edges[band:band + 2]
+                weights[band] = (bin_freqs >= low) & (bin_freqs < high)
+
+            # Bands narrower than a bin (low bass in LOG/OCTAVE/MEL) interpolate between the two nearest bins
+            if not weights[band].any():
+                position = np.clip(self.freqs[band] / bin_freqs[1], 0, len(bin_freqs) - 1)
+                below = int(position)
+                above = min(below + 1, len(bin_freqs) - 1)
+                weights[band, below] += 1 - (position - below)
+                weights[band, above] += position - below
+
+        return weights / weights.sum(axis=1, keepdims=True)
+
+def _hz_to_mel(freq):
+    return 2595 * np.log10(1 + np.asarray(freq) / 700)
+
+def _mel_to_hz(mel):
+    return 700 * (10 ** (np.asarray(mel) / 2595) - 1)
@@ -1,5 +1,7 @@
 import pygame
 import visuals
+from components.dirty_regions import merge_rects
+from components.text_cache import TextCache
 
 '''
 Button Super Class
@@ -12,6 +14,9 @@ Button Super Class
         value: the value that will be sent to the vizualizer class to change a property
 '''
 class Button:
+    FONT_SIZE = 16
+    text_cache = TextCache() # Shared by every button, so every label is rendered once
+
     def __init__(self, screen, x, y, width, height, text, toggled = False, value = 0):
         self. x, self.y = x, y
         self.width, self.height = width, height
@@ -20,19 +25,33 @@ class Button:
         self.toggled = toggled
         self.clicked = False
         self.value = value
+        self.info = None # Line of info shown above the button while toggled
+        self.buttons = [] # Sub-buttons shown while toggled
 
-        self.font = pygame.font.Font(size = 16)
-
-    # Draw the button and check for mouse click
+    # Input comes from the InputDispatcher, buttons with sub-buttons act on the ones that were clicked here
     def update(self):
-        self.render()
-        self.check_clicked()
-    
-    def render(self):
-        
-        self.button_text = self.font.render(self.text, True, 'Black')
+        pass
+
+    def get_targets(self):
+        """
+        Return (rect, widget) of the button and, if toggled, the sub-buttons, for the InputDispatcher.
+        """
+        targets = [(pygame.Rect(self.x, self.y, self.width, self.height), self)]
+        if self.toggled:
+            for button in self.buttons:
+                targets += button.get_targets()
+        return targets
 
-        pygame.draw.rect(self.screen, 'darkgrey', (self.x, self.y, self.width, self.height))
+    def get_state(self):
+        """
+        Return everything the button shows, the menu is only rendered again when this changes.
+        """
+        buttons = tuple(button.get_state() for button in self.buttons) if self.toggled else None
+        return (self.text, self.clicked, self.toggled, self.info, buttons)
+
+    # Draw the button, and its info and sub-buttons if toggled, returns the rectangles drawn on
+    def render(self):
+        rect = pygame.draw.rect(self.screen, 'darkgrey', (self.x, self.y, self.width, self.height))
 
         # Darken when clicked for responsiveness
         if self.clicked:
@@ -40,72 +59,106 @@ class Button:
         else:
             pygame.draw.rect(self.screen, 'white', (self.x + 1, self.y + 1, self.width -3, self.height-3))
 
-        self.screen.blit(self.button_text, (self.x + 1, self.y + (self.height * 0.2)))
+        button_text = self.text_cache.render(self.text, self.FONT_SIZE, 'Black')
+        rects = [rect.union(self.screen.blit(button_text, (self.x + 1, self.y + (self.height * 0.2))))]
 
-    # Makes sure to count only single click, not every milisecond during the click
-    def check_clicked(self):
-        mouse_pos = pygame.mouse.get_pos()
-        button_pos = pygame.rect.Rect((self.x,self.y), (self.width, self.height))
-     
-        # If not clicked before, and the mouse is clicking on it:
-        if not self.clicked and pygame.mouse.get_pressed()[0] and button_pos.collidepoint(mouse_pos):
-            self.clicked = True
+        if self.toggled:
+            if self.info is not None:
+                text = self.text_cache.render(self.info, self.FONT_SIZE, 'White')
+                rects.append(pygame.draw.rect(self.screen, 'Black', (self.x, self.y - self.height, text.get_width() + 4, self.height)))
+                rects.append(self.screen.blit(text, (self.x, self.y - self.height)))
+            for button in self.buttons:
+                rects += button.render()
+        return rects
 
-        # If is clicked and the mouse is no longer clicking:
-        if self.clicked and not pygame.mouse.get_pressed()[0]:
-            self.clicked = False
-            self. toggled = not self.toggled
+    # Darken while the mouse is held down on the button, a click only counts once it is let go (anywhere)
+    def press(self, pos):
+        self.clicked = True
+
+    def drag(self, pos): pass
+
+    def release(self, pos):
+        self.clicked = False
+        self.toggled = not self.toggled
 
 '''
 Contains the main buttons that contain sub-buttons
+
+The menu is drawn on an overlay surface the size of the screen, and is only drawn again when the state
+of a button, an info line or the quality tier changes. Every frame the parts of the overlay the menu was
+drawn on are copied to the screen in one blits call.
 '''
 class ButtonMenu():
+    FONT_SIZE = 18
+
     def __init__(self, screen, visualizer, x=0, y=0, width=140, height=18):
         self.screen = screen
+        self.overlay = pygame.Surface(screen.get_size())
         self.x, self.y , = x, y
         self.width, self.height, = width, height
-        self.font = pygame.font.Font(size = 18)
         self.visualizer = visualizer
         self.main_buttons = [] # Holds main buttons which themselves contain sub-buttons
-        self.main_buttons.append(TypeButton(self.screen, self.x, self.height*4, self.width, self.height, "VISUAL TYPE", self.visualizer))
-        self.main_buttons.append(BarButton(self.screen, self.x, self.height*5.5, self.width, self.height, "BAR PROPERTIES", self.visualizer))
-        self.main_buttons.append(CircleButton(self.screen, self.x, self.height*7, self.width, self.height, "CIRCLE PROPERTIES", self.visualizer))
-        self.main_buttons.append(SparkButton(self.screen, self.x, self.height*8.5, self.width, self.height, "SPARK PROPERTIES", self.visualizer))
-        self.main_buttons.append(ColorButton(self.screen, self.x, self.height*10, self.width, self.height, "COLOR PROPERTIES", self.visualizer))
-        self.main_buttons.append(SpecialButton(self.screen, self.x, self.height*11.5, self.width, self.height, "SPECIAL PROPERTIES", self.visualizer))
-        self.main_buttons.append(PresetsButton(self.screen, self.x, self.height*13, self.width, self.height, "PRESETS", self.visualizer))
-    
+        self.main_buttons.append(TypeButton(self.overlay, self.x, self.height*4, self.width, self.height, "VISUAL TYPE", self.visualizer))
+        self.main_buttons.append(BarButton(self.overlay, self.x, self.height*5.5, self.width, self.height, "BAR PROPERTIES", self.visualizer))
+        self.main_buttons.append(CircleButton(self.overlay, self.x, self.height*7, self.width, self.height, "CIRCLE PROPERTIES", self.visualizer))
+        self.main_buttons.append(SparkButton(self.overlay, self.x, self.height*8.5, self.width, self.height, "SPARK PROPERTIES", self.visualizer))
+        self.main_buttons.append(ColorButton(self.overlay, self.x, self.height*10, self.width, self.height, "COLOR PROPERTIES", self.visualizer))
+        self.main_buttons.append(SpecialButton(self.overlay, self.x, self.height*11.5, self.width, self.height, "SPECIAL PROPERTIES", self.visualizer))
+        self.main_buttons.append(PresetsButton(self.overlay, self.x, self.height*13, self.width, self.height, "PRESETS", self.visualizer))
+        self.__state = None # State the overlay was drawn with
+        self.__regions = [] # Parts of the overlay drawn on
+        self.targets = [] # (rect, widget) of the widgets shown, for the InputDispatcher
+
+    # If one of the main buttons is toggled, only that one button is shown
+    def __get_visible(self):
+        toggled = [button for button in self.main_buttons if button.toggled]
+        return toggled or self.main_buttons
+
+    # Returns the rectangles drawn on
     def update(self):
-        self.render()
-
-        # If one of the main buttons is toggled, only update that one button
-        if any(button.toggled for button in self.main_buttons):
-            for button in self.main_buttons:
-                if button.toggled:
-                    button.update()
-
-        # Update all buttons
-        else:
-            for button in self.main_buttons:
-                button.update()
+        for button in self.__get_visible():
+            button.update()
+
+        visible = self.__get_visible()
+        state = (self.visualizer.get_quality(), tuple(button.get_state() for button in visible))
+        if state != self.__state:
+            self.__state = state
+            self.overlay.fill('Black')
+            rects = self.render()
+            for button in visible:
+                rects += button.render()
+            self.__regions = merge_rects(rects, self.overlay.get_rect())
+            self.targets = [target for button in visible for target in button.get_targets()]
+
+        self.screen.blits([(self.overlay, rect.topleft, rect) for rect in self.__regions], doreturn=False)
+        return list(self.__regions)
 
     # Display info for key bindings
     def render(self):
-        text = self.font.render("TAB = HIDE MENU", True, 'White')
-        pygame.draw.rect(self.screen, 'Black', (0, 0, text.get_width() + 4, self.height))
-        self.screen.blit(text, (1, 1))
-
-        text = self.font.render("ARROW KEYS = FAST FORWARD / REWIND", True, 'White')
-        pygame.draw.rect(self.screen, 'Black', (0, self.height, text.get_width() + 4, self.height))
-        self.screen.blit(text, (1, self.height*1.15))
-
-        text = self.font.render("SHIFT + ARROW KEYS = CHANGE SONG", True, 'White')
-        pygame.draw.rect(self.screen, 'Black', (0, self.height*2, text.get_width() + 4, self.height))
-        self.screen.blit(text, (1, self.height*2.15))
-
-        text = self.font.render("SPACE = PAUSE", True, 'White')
-        pygame.draw.rect(self.screen, 'Black', (0, self.height*3, text.get_width() + 4, self.height))
-        self.screen.blit(text, (1, self.height*3.15))
+        rects = []
+        text_cache = Button.text_cache
+        text = text_cache.render("TAB = HIDE MENU", self.FONT_SIZE, 'White')
+        rects.append(pygame.draw.rect(self.overlay, 'Black', (0, 0, text.get_width() + 4, self.height)))
+        rects.append(self.overlay.blit(text, (1, 1)))
+
+        text = text_cache.render("ARROW KEYS = FAST FORWARD / REWIND", self.FONT_SIZE, 'White')
+        rects.append(pygame.draw.rect(self.overlay, 'Black', (0, self.height, text.get_width() + 4, self.height)))
+        rects.append(self.overlay.blit(text, (1, self.height*1.15)))
+
+        text = text_cache.render("SHIFT + ARROW KEYS = CHANGE SONG", self.FONT_SIZE, 'White')
+        rects.append(pygame.draw.rect(self.overlay, 'Black', (0, self.height*2, text.get_width() + 4, self.height)))
+        rects.append(self.overlay.blit(text, (1, self.height*2.15)))
+
+        text = text_cache.render("SPACE = PAUSE", self.FONT_SIZE, 'White')
+        rects.append(pygame.draw.rect(self.overlay, 'Black', (0, self.height*3, text.get_width() + 4, self.height)))
+        rects.append(self.overlay.blit(text, (1, self.height*3.15)))
+
+        # Quality tier picked to keep up the frame rate, next to the last key binding
+        x = text.get_width() + 12
+        text = text_cache.render(f"QUALITY: {self.visualizer.get_quality()}", self.FONT_SIZE, 'White')
+        rects.append(pygame.draw.rect(self.overlay, 'Black', (x, self.height*3, text.get_width() + 4, self.height)))
+        rects.append(self.overlay.blit(text, (x + 1, self.height*3.15)))
+        return rects
 
 # Main button for changing visual type
 class TypeButton(Button):
@@ -125,10 +178,7 @@ class TypeButton(Button):
         self.buttons.append(Button (screen, x, y + (height * 10.5), width, height, "CIRCLE WAVE", value=self.visual_type.CIRCLE_WAVE))
 
     def update(self):
-        self.render()
-        self.check_clicked()
-
-        # If toggled, render sub-buttons and change text to 'BACK'
+        # If toggled, show sub-buttons and change text to 'BACK'
         if self.toggled:
             self.text = self.secondary_text
 
@@ -137,7 +187,6 @@ class TypeButton(Button):
                 if button.toggled:
                     self.visualizer.change_visual_type(button.value)
                     button.toggled = False
-                button.update()
         else:
             self.text = self.primary_text
 
@@ -168,19 +217,13 @@ class BarButton(Button):
         self.buttons.append(Button (screen, x, y + (height * 14), width, height, "RESET BARS", value=True))
 
     def update(self):
-        self.render()
-        self.check_clicked()
-
-        # If toggled, render sub-buttons and change text to 'BACK'
+        # If toggled, show sub-buttons and change text to 'BACK'
         if self.toggled:
             # Get info from first bar to display
-            bar_info = self.visualizer.bars[0]
-            info_text = (f"width: {round(bar_info.width, 1)}, max height: {bar_info.max_height}, " 
+            bar_info = self.visualizer.get_bar_info()
+            self.info = (f"width: {round(bar_info.width, 1)}, max height: {bar_info.max_height}, " 
                 f"min height: {bar_info.min_height}, grow speed: {round(bar_info.grow_speed, 3)}, "
                 f"shrink speed: {round(bar_info.shrink_speed, 3)}")
-            text = self.font.render(info_text, True, 'White')
-            pygame.draw.rect(self.screen, 'Black', (self.x, self.y - self.height, text.get_width() + 4, self.height))
-            self.screen.blit(text, (self.x, self.y - self.height))
         
             self.text = self.secondary_text
 
@@ -189,24 +232,27 @@ class BarButton(Button):
                 if button.toggled:
                     button.toggled = False
                     self.visualizer.change_property(button.text, button.value)
-                button.update()
         else:
             self.text = self.primary_text
 
 # Main button for changing spark properties
 class SparkButton(Button):
+    STATS_INTERVAL = 250 # Milliseconds between updates of the spark count and sprite stats, they change every frame
+
     def __init__(self, screen, x, y, width, height, text, visualizer, visible=False):
         super().__init__(screen, x, y, width, height, text, visible)
         self.primary_text = text
         self.secondary_text = "BACK"
         self.visualizer = visualizer
         self.buttons = []
+        self.__stats = None # (spark count, sprite count, sprite hit rate) shown in the info
+        self.__stats_ticks = 0 # Time the stats were taken
 
         self.buttons.append(Button (screen, x, y + (height * 1.5), width, height, "SPARK ON / OFF"))
 
-        self.buttons.append(Button (screen, x, y + (height * 3), width, height, "LIMIT +", value=1))
+        self.buttons.append(Button (screen, x, y + (height * 3), width, height, "LIMIT +", value=50))
         self.buttons.append(Button (screen, x, y + (height * 4), width, height, "RANDOM LIMIT", value=0))
-        self.buttons.append(Button (screen, x, y + (height * 5), width, height, "LIMIT -", value=-1))
+        self.buttons.append(Button (screen, x, y + (height * 5), width, height, "LIMIT -", value=-50))
 
         self.buttons.append(Button (screen, x, y + (height * 6.5), width, height, "SPAWN RATE +", value=-50))
         self.buttons.append(Button (screen, x, y + (height * 7.5), width, height, "RANDOM SPAWN", value=0))
@@ -234,23 +280,26 @@ class SparkButton(Button):
         self.buttons.append(Button (screen, x, y + (height * 26.5), width, height, "HEIGHT THRESHOLD +", value=0.05))
         self.buttons.append(Button (screen, x, y + (height * 27.5), width, height, "HEIGHT THRESHOLD -", value=-0.05))
 
-        self.buttons.append(Button (screen, x, y + (height * 29), width, height, "RESET SPARKS", value=True))
+        self.buttons.append(Button (screen, x, y + (height * 29), width, height, "ADDITIVE ON / OFF"))
 
-    def update(self):
-        self.render()
-        self.check_clicked()
+        self.buttons.append(Button (screen, x, y + (height * 30.5), width, height, "RESET SPARKS", value=True))
 
-        # If toggled, render sub-buttons and change text to 'BACK'
+    def update(self):
+        # If toggled, show sub-buttons and change text to 'BACK'
         if self.toggled:
-            # Get info from first bar to display
-            bar_info = self.visualizer.bars[0]
-            info_text = (f"limit: {round(bar_info.spark_manager.properties.limit)}, spawn: {round(bar_info.spark_manager.properties.spawn_rate)}ms, " 
-                f"size: {round(bar_info.spark_manager.properties.size, 3)}, fade: {round(bar_info.spark_manager.properties.fade_rate, 7)}, gravity: "
-                f"{round(bar_info.spark_manager.properties.gravity, 4)}, velocity: {round(bar_info.spark_manager.properties.velocity_rate, 3)}, "
-                f"height threshold: {round(bar_info.spark_manager.properties.threshold, 2)}")
-            text = self.font.render(info_text, True, 'White')
-            pygame.draw.rect(self.screen, 'Black', (self.x, self.y - self.height, text.get_width() + 4, self.height))
-            self.screen.blit(text, (self.x, self.y - self.height))
+            # Get info of the spark pool to display
+            sparks = self.visualizer.get_bar_info().sparks
+            # Taken a few times per second only, so the menu isn't rendered again every frame for them
+            ticks = pygame.time.get_ticks()
+            if self.__stats is None or ticks - self.__stats_ticks >= self.STATS_INTERVAL:
+                self.__stats = (len(sparks), len(sparks.sprites), round(sparks.sprites.get_hit_rate() * 100))
+                self.__stats_ticks = ticks
+            count, sprites, hit_rate = self.__stats
+            self.info = (f"sparks: {count}, limit: {sparks.get_budget()}, spawn: {round(sparks.properties.spawn_rate)}ms, " 
+                f"size: {round(sparks.properties.size, 3)}, fade: {round(sparks.properties.fade_rate, 7)}, gravity: "
+                f"{round(sparks.properties.gravity, 4)}, velocity: {round(sparks.properties.velocity_rate, 3)}, "
+                f"height threshold: {round(sparks.properties.threshold, 2)}, additive: {sparks.additive}, "
+                f"sprites: {sprites} ({hit_rate}% hits)")
 
             self.text = self.secondary_text
 
@@ -259,8 +308,6 @@ class SparkButton(Button):
                 if button.toggled:
                     button.toggled = False
                     self.visualizer.change_spark_property(button.text, button.value)
-        
-                button.update()
         else:
             self.text = self.primary_text
 
@@ -285,17 +332,11 @@ class CircleButton(Button):
         self.buttons.append(Button (screen, x, y + (height * 9), width, height, "RESET CIRCLE", value=True))
 
     def update(self):
-        self.render()
-        self.check_clicked()
-
-        # If toggled, render sub-buttons and change text to 'BACK'
+        # If toggled, show sub-buttons and change text to 'BACK'
         if self.toggled:
             # Get info from first bar to display
-            bar_info = self.visualizer.bars[0]
-            info_text = (f"radius: {bar_info.radius}, ring radius: {bar_info.ring_radius}, ring size: {round(bar_info.ring_size, 3)}")
-            text = self.font.render(info_text, True, 'White')
-            pygame.draw.rect(self.screen, 'Black', (self.x, self.y - self.height, text.get_width() + 4, self.height))
-            self.screen.blit(text, (self.x, self.y - self.height))
+            bar_info = self.visualizer.get_bar_info()
+            self.info = (f"radius: {bar_info.radius}, ring radius: {bar_info.ring_radius}, ring size: {round(bar_info.ring_size, 3)}")
 
             self.text = self.secondary_text
 
@@ -304,7 +345,6 @@ class CircleButton(Button):
                 if button.toggled:
                     button.toggled = False
                     self.visualizer.change_property(button.text, button.value) 
-                button.update()
         else:
             self.text = self.primary_text
 
@@ -324,10 +364,7 @@ class PresetsButton(Button):
         self.buttons.append(Button (screen, x, y + (height * 9), width, height, "RAIN"))
 
     def update(self):
-        self.render()
-        self.check_clicked()
-
-        # If toggled, render sub-buttons and change text to 'BACK'
+        # If toggled, show sub-buttons and change text to 'BACK'
         if self.toggled:
         
             self.text = self.secondary_text
@@ -337,7 +374,6 @@ class PresetsButton(Button):
                 if button.toggled:
                     button.toggled = False
                     self.visualizer.change_preset(button.text)
-                button.update()
         else:
             self.text = self.primary_text
 
@@ -357,20 +393,31 @@ class SpecialButton(Button):
         self.buttons.append(Button (screen, x, y + (height * 5), width, height, "SMOOTHING +", value=-0.1))
         self.buttons.append(Button (screen, x, y + (height * 6), width, height, "SMOOTHING ON/OFF", value=0))
         self.buttons.append(Button (screen, x, y + (height * 7), width, height, "SMOOTHING -", value=0.1))
+        self.buttons.append(Button (screen, x, y + (height * 8), width, height, "SMOOTH WIDTH +", value=2))
+        self.buttons.append(Button (screen, x, y + (height * 9), width, height, "SMOOTH WIDTH -", value=-2))
 
-        self.buttons.append(Button (screen, x, y + (height * 8.5), width, height, "RESET", value=1))
+        self.buttons.append(Button (screen, x, y + (height * 10.5), width, height, "DECAY +", value=0.1))
+        self.buttons.append(Button (screen, x, y + (height * 11.5), width, height, "DECAY ON/OFF", value=0))
+        self.buttons.append(Button (screen, x, y + (height * 12.5), width, height, "DECAY -", value=-0.1))
 
-    def update(self):
-        self.render()
-        self.check_clicked()
+        self.buttons.append(Button (screen, x, y + (height * 14), width, height, "PEAK HOLD +", value=0.1))
+        self.buttons.append(Button (screen, x, y + (height * 15), width, height, "PEAK HOLD ON/OFF", value=0))
+        self.buttons.append(Button (screen, x, y + (height * 16), width, height, "PEAK HOLD -", value=-0.1))
+
+        self.buttons.append(Button (screen, x, y + (height * 17.5), width, height, "NOISE GATE +", value=0.05))
+        self.buttons.append(Button (screen, x, y + (height * 18.5), width, height, "NOISE GATE ON/OFF", value=0))
+        self.buttons.append(Button (screen, x, y + (height * 19.5), width, height, "NOISE GATE -", value=-0.05))
+
+        self.buttons.append(Button (screen, x, y + (height * 21), width, height, "RESET", value=1))
 
-        # If toggled, render sub-buttons and change text to 'BACK'
+    def update(self):
+        # If toggled, show sub-buttons and change text to 'BACK'
         if self.toggled:
             # Get info to display
-            info_text = (f"rotation speed: {self.visualizer.get_rotate_speed()}, smoothing factor: {round(self.visualizer.get_smoothing_factor(), 3)}")
-            text = self.font.render(info_text, True, 'White')
-            pygame.draw.rect(self.screen, 'Black', (self.x, self.y - self.height, text.get_width() + 4, self.height))
-            self.screen.blit(text, (self.x, self.y - self.height))
+            filters = self.visualizer.get_filters()
+            self.info = (f"rotation speed: {self.visualizer.get_rotate_speed()}, filters: {' > '.join(filters.stages) or 'none'}, "
+                f"smoothing factor: {round(filters.smoothing_factor, 3)}, smooth width: {filters.smoothing_width}, "
+                f"decay: {round(filters.decay, 2)}s, peak hold: {round(filters.hold, 2)}s, noise gate: {round(filters.gate, 2)}")
         
             self.text = self.secondary_text
 
@@ -379,7 +426,6 @@ class SpecialButton(Button):
                 if button.toggled:
                     button.toggled = False
                     self.visualizer.change_special_property(button.text, button.value)
-                button.update()
         else:
             self.text = self.primary_text
 
@@ -405,36 +451,27 @@ class ColorButton(Button):
         self.buttons.append(Button (screen, x, y + (height * 10), width, height, "GLOW LENGTH +", value=0.05))
         self.buttons.append(Button (screen, x, y + (height * 11), width, height, "GLOW LENGTH -", value=-0.05))
 
-        self.buttons.append(Button (screen, x, y + (height * 12.5), width, height, "RESET COLORS"))
+        self.buttons.append(Button (screen, x, y + (height * 12.5), width, height, "GLOW BLEND ON/OFF", value=True))
 
-        self.r_slider = Slider(screen, x+10, y + height * 14, width, 20, 0, 255, 255, lambda v: (v, 0, 0))
-        self.g_slider = Slider(screen, x+10, y + height * 15, width, 20, 0, 255, 255, lambda v: (0, v, 0))
-        self.b_slider = Slider(screen, x+10, y + height * 16, width, 20, 0, 255, 255, lambda v: (0, 0, v))
+        self.buttons.append(Button (screen, x, y + (height * 14), width, height, "RESET COLORS"))
 
-    def update(self):
-        self.render()
-        self.check_clicked()
+        self.r_slider = Slider(screen, x+10, y + height * 15.5, width, 20, 0, 255, 255, lambda v: (v, 0, 0))
+        self.g_slider = Slider(screen, x+10, y + height * 16.5, width, 20, 0, 255, 255, lambda v: (0, v, 0))
+        self.b_slider = Slider(screen, x+10, y + height * 17.5, width, 20, 0, 255, 255, lambda v: (0, 0, v))
 
+    def update(self):
         if self.toggled:
             bar_info = self.visualizer.get_bar_info()
-            info_text = (f"RGB: {int(self.r_slider.value), int(self.g_slider.value), int(self.b_slider.value)}, "
+            self.info = (f"RGB: {int(self.r_slider.value), int(self.g_slider.value), int(self.b_slider.value)}, "
                 f"color cycle speed: {round(self.visualizer.get_color_speed(), 3)}, "
                 f"glow: {bar_info.glow_enabled}, glow intensity: {round(bar_info.glow_intensity, 3)}, glow length: "
-                f"{round(bar_info.glow_length, 3)}")
-
-            text = self.font.render(info_text, True, 'White')
-            pygame.draw.rect(self.screen, 'Black', (self.x, self.y - self.height, text.get_width() + 4, self.height))
-            self.screen.blit(text, (self.x, self.y - self.height))
+                f"{round(bar_info.glow_length, 3)}, glow blend: {bar_info.glow_blend}")
 
             self.text = self.secondary_text
 
             for button in self.buttons:
-                button.update()
                 if button.toggled:
                     if button.text == "CHANGE COLOR":
-                            self.r_slider.update()
-                            self.g_slider.update()
-                            self.b_slider.update()
                             self.visualizer.change_color_property(button.text, (self.r_slider.value, self.g_slider.value, self.b_slider.value))
                     else:
                         button.toggled = False
@@ -442,6 +479,27 @@ class ColorButton(Button):
         else:
             self.text = self.primary_text
 
+    # The sliders are shown while CHANGE COLOR is toggled
+    def __showing_sliders(self):
+        return self.toggled and self.buttons[0].toggled
+
+    def get_targets(self):
+        targets = super().get_targets()
+        if self.__showing_sliders():
+            targets += [slider.get_target() for slider in (self.r_slider, self.g_slider, self.b_slider)]
+        return targets
+
+    def get_state(self):
+        sliders = tuple(slider.handle_x for slider in (self.r_slider, self.g_slider, self.b_slider)) if self.__showing_sliders() else None
+        return (super().get_state(), sliders)
+
+    def render(self):
+        rects = super().render()
+        if self.__showing_sliders():
+            for slider in (self.r_slider, self.g_slider, self.b_slider):
+                rects += slider.render()
+        return rects
+
 class Slider:
     def __init__(self, screen, x, y, width, height, min_val, max_val, initial_val, color_func):
         self.screen = screen
@@ -454,36 +512,36 @@ class Slider:
         self.value = initial_val
         self.handle_x = self.x + (self.width * (self.value - self.min_val) / (self.max_val - self.min_val))
         self.color_func = color_func
-
-        self.font = pygame.font.Font(None, 24)
         self.dragging = False
 
-    def handle_drag(self):
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_pressed = pygame.mouse.get_pressed()[0]
+        # Gradient background, drawn once and blitted after
+        self.gradient = pygame.Surface((self.width, self.height + 1))
+        for i in range(self.width):
+            color = self.color_func(self.min_val + (self.max_val - self.min_val) * (i / self.width))
+            pygame.draw.line(self.gradient, color, (i, 0), (i, self.height))
 
-        # If mouse is pressed on the handle
-        if mouse_pressed and not self.dragging:
-            if pygame.Rect(self.handle_x, self.y, 10, self.height).collidepoint(mouse_pos):
-                self.dragging = True
+    # The handle can be dragged past the end of the gradient by its width
+    def get_target(self):
+        return (pygame.Rect(self.x, self.y, self.width + 10, self.height), self)
 
-        if not mouse_pressed:
-            self.dragging = False
+    # Only pressing on the handle starts dragging it
+    def press(self, pos):
+        self.dragging = pygame.Rect(self.handle_x, self.y, 10, self.height).collidepoint(pos)
 
-        # Make sure handle is within bounds and get the value
+    # Make sure handle is within bounds and get the value
+    def drag(self, pos):
         if self.dragging:
-            self.handle_x = max(self.x, min(mouse_pos[0], self.x + self.width))
+            self.handle_x = max(self.x, min(pos[0], self.x + self.width))
             self.value = self.min_val + (self.handle_x - self.x) * (self.max_val - self.min_val) / self.width
 
-    def update(self):
-        self.handle_drag()
-        self.render()
+    def release(self, pos):
+        self.drag(pos)
+        self.dragging = False
 
+    # Returns the rectangles drawn on, the handle can stick out past the gradient
     def render(self):
-        # Gradient background
-        for i in range(self.width):
-            color = self.color_func(self.min_val + (self.max_val - self.min_val) * (i / self.width))
-            pygame.draw.line(self.screen, color, (self.x + i, self.y), (self.x + i, self.y + self.height))
+        gradient = self.screen.blit(self.gradient, (self.x, self.y))
         
         # Handle
-        pygame.draw.rect(self.screen, 'white', (self.handle_x, self.y, 10, self.height))
\ No newline at end of file
+        handle = pygame.draw.rect(self.screen, 'white', (self.handle_x, self.y, 10, self.height))
+        return [gradient, handle]
@@ -0,0 +1,62 @@
+import pygame
+
+'''
+DirtyRegions class redraws only the parts of the screen that change instead of the whole window.
+
+Every frame, clear() blacks out what was drawn the frame before, then everything is drawn and the
+rectangles it was drawn on are passed to present(), which updates those and last frame's rectangles
+on the display. With enabled False it clears and presents the whole screen, like before.
+
+Args:
+        screen: display surface
+        enabled: whether to clear and present only the dirty rectangles
+'''
+class DirtyRegions:
+    def __init__(self, screen, enabled=True):
+        self.screen = screen
+        self.enabled = enabled
+        self.__previous = [screen.get_rect()] # Everything counts as drawn on before the first frame
+
+    def clear(self):
+        if not self.enabled:
+            self.screen.fill('Black')
+            return
+        for rect in self.__previous:
+            self.screen.fill('Black', rect)
+
+    def present(self, rects):
+        """
+        Update the rectangles drawn on this frame and the ones drawn on last frame.
+
+        Args:
+            rects (list): Rectangles drawn on this frame, None entries are skipped.
+        """
+        if not self.enabled:
+            pygame.display.update()
+            return
+        current = merge_rects(rects, self.screen.get_rect())
+        pygame.display.update(merge_rects(self.__previous + current, self.screen.get_rect()))
+        self.__previous = current
+
+def merge_rects(rects, bounds):
+    """
+    Clip rects to bounds and merge the ones that overlap, so no pixel is cleared or presented twice.
+
+    Returns:
+        list: Non empty, non overlapping rectangles.
+    """
+    merged = []
+    for rect in rects:
+        if rect is None:
+            continue
+        rect = pygame.Rect(rect).clip(bounds)
+        if rect.width == 0 or rect.height == 0:
+            continue
+        # Swallow every rectangle it overlaps, the union can overlap more, so repeat until nothing does
+        overlapping = rect.collidelistall(merged)
+        while overlapping:
+            for i in reversed(overlapping):
+                rect.union_ip(merged.pop(i))
+            overlapping = rect.collidelistall(merged)
+        merged.append(rect)
+    return merged
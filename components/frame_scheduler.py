@@ -0,0 +1,101 @@
+import time
+import pygame
+
+'''
+FrameScheduler paces the render loop and measures the time between frames.
+
+Frames are started every 1 / target_fps seconds on a fixed cadence, sleeping in between instead of
+spinning. A frame that runs late starts the cadence over rather than rushing the frames after it. When
+vsync is on and the target is at least the display's refresh rate, flipping the display already waits
+for the refresh, so the scheduler doesn't sleep on top of it.
+
+In idle mode frames drop to idle_fps. The wait is cut short by any input event, so the loop reacts
+to the user right away, and the event is left in the queue for the loop to handle.
+
+Delta times come from a monotonic clock, so they never go backwards or jump when the song is seeked.
+
+Args:
+        target_fps: frames per second to aim for, None for the display's refresh rate, 0 for no limit
+        idle_fps: frames per second in idle mode
+        vsync: whether the display was created with vsync
+'''
+class FrameScheduler:
+    SPIN_TIME = 0.001 # Seconds before the deadline to stop sleeping and wait actively, sleep isn't that precise
+    MAX_DELTA = 0.25 # Longest delta time reported, so a stall doesn't make everything jump
+
+    def __init__(self, target_fps=None, idle_fps=10, vsync=False):
+        if target_fps is None:
+            target_fps = get_refresh_rate()
+        self.target_fps = target_fps
+        self.idle_fps = idle_fps
+        self.vsync = vsync
+        self.idle = False
+        self.__last = time.perf_counter()
+        self.__deadline = self.__last
+
+    def get_frame_time(self):
+        """
+        Return the seconds a frame has at the target rate, or at the refresh rate if there is no limit.
+        """
+        return 1 / (self.target_fps or get_refresh_rate())
+
+    def __get_interval(self):
+        fps = self.idle_fps if self.idle else self.target_fps
+        if not fps or (self.vsync and not self.idle and fps >= get_refresh_rate()):
+            return 0
+        return 1 / fps
+
+    def tick(self, idle=False):
+        """
+        Wait until the next frame is due and return the seconds since the last frame.
+
+        Args:
+            idle (bool): Whether the next frame can wait for the idle rate.
+        """
+        self.idle = idle
+        interval = self.__get_interval()
+        if interval:
+            self.__deadline += interval
+            now = time.perf_counter()
+            if self.__deadline < now - interval:
+                self.__deadline = now # Fell behind by more than a frame, start over instead of catching up
+            elif idle:
+                self.__wait_for_input(self.__deadline - now)
+            else:
+                self.__sleep_until(self.__deadline)
+
+        now = time.perf_counter()
+        if not interval or self.__deadline < now - interval:
+            self.__deadline = now
+        delta_time, self.__last = now - self.__last, now
+        return min(delta_time, self.MAX_DELTA)
+
+    def __sleep_until(self, deadline):
+        remaining = deadline - time.perf_counter()
+        if remaining > self.SPIN_TIME:
+            time.sleep(remaining - self.SPIN_TIME)
+        while time.perf_counter() < deadline:
+            pass
+
+    def __wait_for_input(self, timeout):
+        # Input that is already queued is handled right away, waiting would take it out of the queue
+        if timeout <= 0 or pygame.event.peek():
+            self.__deadline = time.perf_counter()
+            return
+        # event.wait takes the first event out of the queue. Post it back in front of anything that came in since,
+        # a click has to reach the loop as press then release
+        event = pygame.event.wait(int(timeout * 1000))
+        if event.type != pygame.NOEVENT:
+            for queued in [event] + pygame.event.get():
+                pygame.event.post(queued)
+            self.__deadline = time.perf_counter()
+
+def get_refresh_rate(default=60):
+    """
+    Return the refresh rate of the current display mode, default if it's unknown.
+    """
+    try:
+        rate = pygame.display.get_current_refresh_rate()
+    except (pygame.error, AttributeError):
+        return default
+    return rate or default
@@ -0,0 +1,76 @@
+import pygame
+
+'''
+InputDispatcher routes the events of a frame to the widgets and key bindings they are meant for.
+
+Events are read once per frame, so input costs as much as the number of events, not the number of widgets.
+Clicks are hit tested against a grid index of the widgets that can be clicked: every widget's rectangle is
+added to the CELL pixel cells it covers, and a click only tests the widgets in its own cell. The widget the
+left button was pressed on gets the drags and the release, wherever the mouse is by then.
+
+Widgets have press(pos), drag(pos) and release(pos) methods. Key bindings map (key, whether SHIFT is held)
+to a function, a binding without SHIFT also fires with SHIFT held unless the key has its own SHIFT binding.
+
+Args:
+        key_bindings: dict of (key, shift) to the function to call on that key press
+'''
+class InputDispatcher:
+    CELL = 64
+
+    def __init__(self, key_bindings=None):
+        self.key_bindings = key_bindings or {}
+        self.__targets = []
+        self.__cells = {} # (column, row) -> (rect, widget) of every widget in the cell, in drawing order
+        self.__pressed = None # Widget the left button is held down on
+
+    def set_targets(self, targets):
+        """
+        Set the widgets that can be clicked, the index is only rebuilt when it's a different list.
+
+        Args:
+            targets (list): (rect, widget) of every widget, widgets drawn later over earlier ones.
+        """
+        if targets is self.__targets:
+            return
+        self.__targets = targets
+        self.__cells = {}
+        for rect, widget in targets:
+            for column in range(rect.left // self.CELL, (rect.right - 1) // self.CELL + 1):
+                for row in range(rect.top // self.CELL, (rect.bottom - 1) // self.CELL + 1):
+                    self.__cells.setdefault((column, row), []).append((rect, widget))
+
+    def hit_test(self, pos):
+        """
+        Return the topmost widget at pos, None if there is none.
+        """
+        for rect, widget in reversed(self.__cells.get((pos[0] // self.CELL, pos[1] // self.CELL), ())):
+            if rect.collidepoint(pos):
+                return widget
+        return None
+
+    def dispatch(self, events):
+        """
+        Send every event to its widget or key binding.
+
+        Returns:
+            bool: False if the window was closed.
+        """
+        running = True
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                shift = bool(event.mod & pygame.KMOD_SHIFT)
+                action = self.key_bindings.get((event.key, shift)) or self.key_bindings.get((event.key, False))
+                if action is not None:
+                    action()
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                self.__pressed = self.hit_test(event.pos)
+                if self.__pressed is not None:
+                    self.__pressed.press(event.pos)
+            elif event.type == pygame.MOUSEMOTION and self.__pressed is not None:
+                self.__pressed.drag(event.pos)
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self.__pressed is not None:
+                self.__pressed.release(event.pos)
+                self.__pressed = None
+        return running
@@ -1,13 +1,32 @@
 import pygame
-import librosa
-import numpy as np
 import random
+import numpy as np
+from concurrent.futures.process import BrokenProcessPool
+from components import audio_analysis
+from components.audio_source import AudioSource
+from components.playback_clock import PlaybackClock
+from components.prefetcher import AnalysisPrefetcher
+from components.spectrogram_cache import SpectrogramCache
+from components.streaming_analysis import StreamingAnalysis, is_streamable
 
 '''
 MusicPlayer class responsible for playing music and extracting audio data
+
+Args:
+        playlist: list of paths to audio files
+        layout: BandLayout the songs are reduced to, the default layout if None
+        dtype: type the band levels are stored as, see audio_analysis.DTYPES
+        decode: how songs are decoded before analysis, see audio_analysis.DECODE_MODES
+        workers: number of processes analyzing songs in the background, 0 to analyze on the calling thread
+        lookahead: number of upcoming songs to analyze while the current one plays
+        cache_dir: folder to persist analyses in between runs, None to only cache them in memory
+        cache_max_bytes: size cache_dir is kept under
+        interpolate: blend neighbouring analysis frames at the exact render time instead of stepping between them
+        latency: output latency in ms the bars are delayed by to line up with what is heard, None to estimate it from the mixer
+        stream_threshold: songs longer than this many seconds are analyzed while playing with bounded memory (see StreamingAnalysis), None to never stream
 '''
-class MusicPlayer:
-    def __init__(self, playlist):
+class MusicPlayer(AudioSource):
+    def __init__(self, playlist, layout=None, dtype="float16", decode="RESAMPLE", workers=2, lookahead=1, cache_dir=None, cache_max_bytes=4 * 1024**3, interpolate=True, latency=None, stream_threshold=20*60):
         self.track_num = 0
         self.playlist = playlist # List of paths to audio files.
         random.shuffle(playlist)
@@ -15,45 +34,156 @@ class MusicPlayer:
         self.change_time = 0 # Cumulative count of seconds fast forwarded or reveresed
         self.is_paused = False
         self.is_playing = False
+        self.lookahead = lookahead
+        self.stream_threshold = stream_threshold
+        self.interpolate = interpolate
+        self.latency = latency
+        self.clock = PlaybackClock()
+        self.settings = audio_analysis.AnalysisSettings(layout=layout, dtype=dtype, decode=decode)
+        self.silence = np.full(self.settings.layout.bands, audio_analysis.MIN_DECIBEL, dtype=np.float32) # Frame returned while there is no analysis
+        self.cache = SpectrogramCache(cache_dir, max_disk_bytes=cache_max_bytes)
+        self.prefetcher = AnalysisPrefetcher(workers, self.cache.disk) if workers > 0 else None
+        self.analysis = None
+        self.broken = set() # Songs that failed to load or analyze, skipped from then on
     
     def _load_audio_data(self):
         """
-        Load and process audio data for the current song for vizualization.
+        Install the analysis of the current song for vizualization.
 
-        Computes the Short-Time Fourier Transform (STFT) of the audio signal, 
-        converts it to decibels, and calculates index ratios for time and frequency.
+        Songs analyzed before come straight from the cache. Otherwise analysis normally happens in the
+        background (see AnalysisPrefetcher), and if it isn't finished yet the song plays without data
+        until update() finds the result. With workers=0 the song is analyzed here.
+        Songs longer than stream_threshold are never fully analyzed, they are streamed instead.
         """
-        # time_series: A NumPy array representing the audio signal (amplitude values over time).
-        # sample_rate: The number of samples (data points) per second (Hz).
-        time_series, sample_rate = librosa.load(self.current_song)
+        self.current_key = self.cache.key(self.current_song, self.settings)
+        analysis = self.cache.get(self.current_key)
 
-        # Compute STFT to get amplitude values
-        stft = np.abs(librosa.stft(time_series, hop_length=512, n_fft=2048))
+        if analysis is None and self.__should_stream(self.current_song):
+            analysis = StreamingAnalysis(self.current_song, self.settings)
 
-        # Convert amplitude to decibels
-        self.spectrogram = librosa.amplitude_to_db(stft, ref=np.max)
+        if analysis is None and self.prefetcher is None:
+            analysis = audio_analysis.analyze_track(self.current_song, self.settings)
+            self.cache.put(self.current_key, analysis)
 
-        # Get frequencies and times
-        frequencies = librosa.fft_frequencies(n_fft=2048)
-        times = librosa.frames_to_time(np.arange(self.spectrogram.shape[1]), sr=sample_rate, hop_length=512, n_fft=2048)
-        self.length = round(times[-1], 2) * 1000
+        self.__install_analysis(analysis)
+        if self.prefetcher is not None:
+            try:
+                self.__schedule_analysis()
+            except BrokenProcessPool as error:
+                self.__stop_prefetching(error)
+                return self._load_audio_data()
+            self.__take_analysis()
+
+    def __should_stream(self, path):
+        # Only soundfile can stream, checking it first keeps get_duration from falling back to librosa on this thread
+        if self.stream_threshold is None or not is_streamable(path):
+            return False
+        return audio_analysis.get_duration(path) > self.stream_threshold
+
+    def __install_analysis(self, analysis):
+        if self.analysis is not None and self.analysis is not analysis:
+            self.analysis.close()
+        self.analysis = analysis
+        self.length = float('inf') if analysis is None else analysis.length # Unknown until the analysis arrives
+
+    def __schedule_analysis(self):
+        """
+        Analyze the current song first, then the upcoming ones, skipping anything already cached.
+        Anything else in flight is stale.
+        """
+        jobs = {}
+        for i in range(self.lookahead + 1):
+            path = self.playlist[(self.track_num + i) % len(self.playlist)]
+            if path in self.broken:
+                continue
+            try:
+                key = self.current_key if i == 0 else self.cache.key(path, self.settings)
+            except OSError:
+                continue # Gone, it gets skipped when its turn comes
+            if key not in self.cache and not self.__should_stream(path):
+                jobs[key] = path
+        self.prefetcher.schedule([(path, key) for key, path in jobs.items()], self.settings)
+
+    def update(self):
+        """
+        Swap in the analysis of the current song once its worker has finished. Call once per frame.
+        Songs whose streaming analysis fails are skipped like ones that fail to analyze.
+        """
+        try:
+            if isinstance(self.analysis, StreamingAnalysis):
+                self.analysis.check()
+            else:
+                self.__take_analysis()
+        except Exception as error:
+            self.__skip_broken(error)
+
+    def __take_analysis(self):
+        """
+        Install the analysis of the current song if its worker has finished. Raises the error the analysis failed with.
+        """
+        if self.analysis is not None or self.prefetcher is None:
+            return
+        try:
+            analysis = self.prefetcher.take(self.current_key)
+        except BrokenProcessPool as error:
+            # The workers keep dying, which says nothing about the song
+            self.__stop_prefetching(error)
+            self._load_audio_data()
+            return
+        if analysis is not None:
+            self.cache.put(self.current_key, analysis, persist=False) # The worker already wrote it to disk
+            self.__install_analysis(analysis)
+
+    def __stop_prefetching(self, error):
+        """
+        Give up on the background workers, songs are analyzed on the calling thread from now on.
+        """
+        print(f"Analyzing on the main thread from now on: {str(error) or type(error).__name__}")
+        self.prefetcher.shutdown()
+        self.prefetcher = None
+
+    def get_frame(self, target_time):
+        """
+        Get the decibel level of every band at a specific time.
+
+        Args:
+            target_time (float): The time in seconds. Clamped to the length of the song.
+
+        Returns:
+            np.ndarray: The decibel level of every band, in the order of the layout. The minimum level while the song is still being analyzed.
+        """
+        if self.analysis is None:
+            return self.silence
+        return self.analysis.get_frame(target_time, self.interpolate)
+
+    def get_onsets(self, start_time, end_time):
+        """
+        Get the onsets of the current song between two times.
+
+        Args:
+            start_time, end_time (float): The time in seconds, onsets after start_time up to and including end_time are returned.
+
+        Returns:
+            tuple: The band index and strength (dB) arrays of the onsets. Empty while the song is still being analyzed.
+        """
+        if self.analysis is None:
+            return super().get_onsets(start_time, end_time)
+        return self.analysis.get_onsets(start_time, end_time)
 
-        # Calculate index ratios
-        self.time_index_ratio = len(times) / times[-1]
-        self.freq_index_ratio = len(frequencies) / frequencies[-1]
-    
     def get_decibel(self, target_time, freq):
         """
         Get the decibel level at a specific time and frequency.
 
         Args:
             target_time (float): The time in seconds.
-            freq (float): The frequency in Hz.
+            freq (float): The center frequency in Hz of one of the bands of the layout.
 
         Returns:
-            float: The decibel level at the specified time and frequency.
+            float: The decibel level at the specified time and frequency. The minimum level while the song is still being analyzed.
         """
-        return self.spectrogram[int(freq * self.freq_index_ratio)][int(target_time * self.time_index_ratio)]
+        if self.analysis is None:
+            return audio_analysis.MIN_DECIBEL
+        return self.analysis.get_decibel(target_time, freq)
 
     def get_length(self):
         """
@@ -96,13 +226,43 @@ class MusicPlayer:
     def play(self):
         """
         Get the audio data for current song, reset the change_time, and play it.
+        Songs that can't be loaded are skipped.
         """
-        self._load_audio_data()
+        while True:
+            try:
+                self._load_audio_data()
+                pygame.mixer.music.load(self.current_song)
+                break
+            except Exception as error:
+                self.__mark_broken(error)
+                self.__move(1)
         self.change_time = 0
-        pygame.mixer.music.load(self.current_song)
+        self.clock.reset()
         pygame.mixer.music.play()
         self.is_playing = True
 
+    def __skip_broken(self, error):
+        """
+        Remember the current song as broken and move on to the next one that isn't.
+        """
+        self.__mark_broken(error)
+        self.next()
+
+    def __mark_broken(self, error):
+        print(f"Skipping {self.current_song}: {str(error) or type(error).__name__}")
+        self.broken.add(self.current_song)
+        if len(self.broken) == len(self.playlist):
+            raise RuntimeError("None of the songs in the playlist can be played") from error
+
+    def __move(self, step):
+        """
+        Step through the playlist by step, looping around, until a song that isn't broken is current.
+        """
+        self.track_num = (self.track_num + step) % len(self.playlist)
+        while self.playlist[self.track_num] in self.broken:
+            self.track_num = (self.track_num + step) % len(self.playlist)
+        self.current_song = self.playlist[self.track_num]
+
     def pause(self):
         """
         Pause current song
@@ -114,6 +274,14 @@ class MusicPlayer:
             pygame.mixer.music.pause()
             self.is_paused = True
 
+    def close(self):
+        """
+        Stop the background analysis workers
+        """
+        self.__install_analysis(None)
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+
     def stop(self):
         """
         Stop playing current song
@@ -127,8 +295,7 @@ class MusicPlayer:
         If the current song is the last one in the playlist, loop back to the first song.
         """
         self.stop()
-        self.track_num = 0 if self.track_num == len(self.playlist) - 1 else self.track_num + 1
-        self.current_song = self.playlist[self.track_num]
+        self.__move(1)
         self.play()
     
     def prev(self):
@@ -137,13 +304,25 @@ class MusicPlayer:
         If the current song is the first one in the playlist, loop back to the last song.
         """
         self.stop()
-        self.track_num = len(self.playlist) - 1 if self.track_num == 0 else self.track_num - 1
-        self.current_song = self.playlist[self.track_num]
+        self.__move(-1)
         self.play()
 
-    def get_current_time(self):
+    def get_latency(self):
+        """
+        Get the output latency in milliseconds. Estimated as one mixer buffer unless set explicitly.
         """
-        Get the current playback position of the song in milliseconds,
+        return self.clock.get_step_interval() if self.latency is None else self.latency
+
+    def get_mixer_time(self):
+        """
+        Get the raw playback position reported by the mixer in milliseconds,
         including any fast forward or rewind adjustments.
         """
-        return pygame.mixer.music.get_pos() + self.change_time
\ No newline at end of file
+        return pygame.mixer.music.get_pos() + self.change_time
+
+    def get_current_time(self):
+        """
+        Get the current playback position of the song in milliseconds, for the frame about to be rendered.
+        Smoothed between mixer updates and shifted back by the output latency.
+        """
+        return self.clock.get_time(self.get_mixer_time(), self.is_paused) - self.get_latency()
@@ -0,0 +1,54 @@
+import time
+
+'''
+PlaybackClock turns the coarse mixer position into a smooth per-frame timestamp.
+
+pygame.mixer.music.get_pos() only moves when the mixer consumes another buffer, so on high refresh
+displays several frames in a row see the same time. The clock extrapolates from the last mixer step
+with a monotonic timer and gently steers back toward the mixer each time it steps. Jumps larger than
+tolerance (seeking, changing songs) are followed immediately.
+
+Args:
+        tolerance: difference in ms between the mixer and the clock that counts as a jump
+        correction: fraction of the error corrected on each mixer step
+'''
+class PlaybackClock:
+    def __init__(self, tolerance=150, correction=0.2):
+        self.tolerance = tolerance
+        self.correction = correction
+        self.__steps = [] # Recent sizes of mixer position steps in ms
+        self.reset()
+
+    def reset(self):
+        self.__anchor_time = None # Mixer time at anchor_perf
+        self.__anchor_perf = 0
+        self.__last_raw = None
+
+    def get_time(self, raw_ms, paused=False):
+        """
+        Return the smoothed playback position in ms for a mixer position of raw_ms.
+        """
+        now = time.perf_counter() * 1000
+        stepped = raw_ms != self.__last_raw
+        if stepped and self.__last_raw is not None and 0 < raw_ms - self.__last_raw < self.tolerance:
+            self.__steps = self.__steps[-63:] + [raw_ms - self.__last_raw]
+        self.__last_raw = raw_ms
+
+        predicted = None if self.__anchor_time is None else self.__anchor_time + (now - self.__anchor_perf)
+        if paused or predicted is None or abs(raw_ms - predicted) > self.tolerance:
+            self.__anchor_time, self.__anchor_perf = raw_ms, now
+            return raw_ms
+
+        # The mixer position is most accurate right when it steps, only correct toward it then
+        if stepped:
+            self.__anchor_time += (raw_ms - predicted) * self.correction
+            predicted += (raw_ms - predicted) * self.correction
+        return predicted
+
+    def get_step_interval(self):
+        """
+        Return the median size of mixer position steps in ms, roughly one mixer buffer, or 0 before any were seen.
+        """
+        if not self.__steps:
+            return 0
+        return sorted(self.__steps)[len(self.__steps) // 2]
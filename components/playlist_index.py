@@ -0,0 +1,149 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import soundfile
+from components import audio_analysis
+
+'''
+PlaylistIndex class keeps a persistent record of every audio file in a folder tree.
+
+Each entry holds the file's size and mtime along with what validation found out about it: its
+duration, sample rate and channel count, or the error it failed with. A rescan only stats the
+files, and validates just the new or changed ones in parallel, so loading a large library that
+hasn't changed costs one directory walk.
+
+Args:
+        folder: root folder, searched recursively
+        index_path: JSON file the index is saved to, None to keep it in memory only
+        extensions: file extensions (lower case) that count as audio files
+        workers: number of processes validating files, all cores if None
+'''
+class PlaylistIndex:
+    VERSION = 2 # Version 1 dropped files only librosa can read
+
+    def __init__(self, folder, index_path=None, extensions=(".mp3", ".wav"), workers=None):
+        self.folder = folder
+        self.index_path = index_path
+        self.extensions = extensions
+        self.workers = workers or os.cpu_count()
+        self.entries = self.__load() # Path relative to folder -> entry dict
+
+    def __load(self):
+        if self.index_path is None:
+            return {}
+        try:
+            with open(self.index_path) as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if index.get("version") != self.VERSION or index.get("folder") != os.path.abspath(self.folder):
+            return {}
+        return index["entries"]
+
+    def save(self):
+        if self.index_path is None:
+            return
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        index = {"version": self.VERSION, "folder": os.path.abspath(self.folder), "entries": self.entries}
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(index, file)
+        os.replace(temp_path, self.index_path)
+
+    def scan(self):
+        """
+        Bring the index up to date with the folder and save it. Files whose size and mtime
+        match their entry are kept as they are, new and changed files are validated.
+
+        Returns:
+            int: Number of files that were validated.
+        """
+        entries = {}
+        stale = []
+        for directory, _, files in os.walk(self.folder):
+            for name in files:
+                if not name.lower().endswith(self.extensions):
+                    continue
+                path = os.path.join(directory, name)
+                relative_path = os.path.relpath(path, self.folder)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue # Removed during the walk
+
+                entry = self.entries.get(relative_path)
+                if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                    entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                    stale.append(relative_path)
+                entries[relative_path] = entry
+
+        if stale:
+            paths = [os.path.join(self.folder, relative_path) for relative_path in stale]
+            for relative_path, info in zip(stale, self.__validate(paths)):
+                entries[relative_path].update(info)
+
+        changed = bool(stale) or len(entries) != len(self.entries)
+        self.entries = entries
+        if changed:
+            self.save()
+        return len(stale)
+
+    def __validate(self, paths):
+        if len(paths) < 2 * self.workers:
+            return [_validate(path) for path in paths] # Not worth starting processes for
+        # Spawn like the analysis workers, so the processes don't inherit any SDL state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+            return list(executor.map(_validate, paths, chunksize=max(1, len(paths) // (4 * self.workers))))
+
+    def get_playable(self):
+        """
+        Return the paths of all files that passed validation, sorted.
+        """
+        return [os.path.join(self.folder, relative_path) for relative_path, entry in sorted(self.entries.items())
+                if entry.get("error") is None]
+
+    def get_total_duration(self):
+        """
+        Return the combined duration in seconds of all files that passed validation.
+        """
+        return sum(entry["duration"] for entry in self.entries.values() if entry.get("error") is None)
+
+    def get_broken(self):
+        """
+        Return {path: error} for all files that failed validation.
+        """
+        return {os.path.join(self.folder, relative_path): entry["error"]
+                for relative_path, entry in sorted(self.entries.items()) if entry.get("error") is not None}
+
+def _validate(path):
+    """
+    Read the header and the first block of an audio file. Formats soundfile can't open are
+    checked the way audio_analysis.get_duration does, through librosa's other decoders.
+
+    Returns:
+        dict: duration (seconds), sample_rate and channels (None if unknown), or error with the reason it can't be played.
+    """
+    try:
+        info = soundfile.info(path)
+    except (RuntimeError, OSError) as error:
+        duration = audio_analysis.get_duration(path)
+        if duration is None:
+            return {"error": str(error) or type(error).__name__}
+        if duration <= 0:
+            return {"error": "No audio"}
+        return {"duration": duration, "sample_rate": None, "channels": None}
+
+    try:
+        with soundfile.SoundFile(path) as file:
+            file.read(1024, dtype="float32") # Catches files with a valid header but broken data
+    except (RuntimeError, OSError) as error:
+        return {"error": str(error) or type(error).__name__}
+
+    if info.frames <= 0:
+        return {"error": "No audio"}
+    return {"duration": info.duration, "sample_rate": info.samplerate, "channels": info.channels}
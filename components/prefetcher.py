@@ -0,0 +1,173 @@
+import multiprocessing
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+from components import audio_analysis
+from components.audio_analysis import Analysis
+
+'''
+AnalysisPrefetcher class analyzes upcoming tracks in a process pool while the current one plays.
+
+Workers write the finished arrays into shared memory blocks and only send back their names,
+so handing a result to the render thread is an attach instead of a pickled copy.
+Results are also persisted to the disk cache from inside the worker. Every worker warms up
+librosa as soon as the pool starts, so the first track doesn't wait for it.
+
+If a worker dies (killed for memory, a crash in native code) the whole pool breaks. It is started
+again and the unfinished jobs are submitted to the new one, up to MAX_RESTARTS times in a row.
+
+Args:
+        workers: number of worker processes
+        disk_cache: DiskCache the workers store their results in, or None
+'''
+class AnalysisPrefetcher:
+    MAX_RESTARTS = 3 # Pools that may break in a row before the prefetcher gives up
+
+    def __init__(self, workers=2, disk_cache=None):
+        self.workers = workers
+        self.__disk_cache = disk_cache
+        self.__requests = {} # Cache key -> (path, settings), in the order they were requested
+        self.__jobs = {} # Cache key -> Future in the current pool
+        self.__restarts = 0
+        self.__executor = self.__start()
+
+    def __start(self):
+        # Spawn so the workers don't inherit the SDL state of the main process
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=audio_analysis.warm_up)
+        # Workers are started on demand, one empty job each starts all of them (and their warm up) now
+        for _ in range(self.workers):
+            executor.submit(_start_worker)
+        return executor
+
+    def schedule(self, jobs, settings):
+        """
+        Make sure every (path, key) pair in jobs is being analyzed, in the given order.
+        Jobs for any other key are stale and get cancelled, or discarded once they finish.
+        Raises BrokenProcessPool once the pool broke more than MAX_RESTARTS times in a row.
+        """
+        keys = [key for _, key in jobs]
+        for key in list(self.__requests):
+            if key not in keys:
+                del self.__requests[key]
+                if key in self.__jobs:
+                    self.__discard(self.__jobs.pop(key))
+
+        for path, key in jobs:
+            if key not in self.__requests:
+                self.__requests[key] = (path, settings)
+        self.__submit_pending()
+
+    def take(self, key):
+        """
+        Hand over the analysis stored under key if it is finished.
+
+        Returns:
+            Analysis: The finished analysis, or None if it is still running or was never scheduled.
+            Re-raises any error the worker ran into while analyzing. A broken pool is started again instead,
+            BrokenProcessPool is only raised once it broke more than MAX_RESTARTS times in a row.
+        """
+        job = self.__jobs.get(key)
+        if job is None or not job.done():
+            return None
+        if job.cancelled() or isinstance(job.exception(), BrokenProcessPool):
+            self.__restart()
+            return None
+
+        del self.__jobs[key], self.__requests[key]
+        self.__restarts = 0 # The worker got to the end of the job, whatever the result
+        metadata, blocks = job.result()
+        arrays = {name: _attach_shared_array(*block) for name, block in blocks.items()}
+        return Analysis.from_arrays(arrays, metadata)
+
+    def __submit_pending(self):
+        for key, (path, settings) in self.__requests.items():
+            if key in self.__jobs:
+                continue
+            try:
+                self.__jobs[key] = self.__executor.submit(_analyze_into_shared_memory, path, settings, key, self.__disk_cache)
+            except BrokenProcessPool:
+                self.__restart()
+                return
+
+    def __restart(self):
+        """
+        Replace the broken pool and submit every job that didn't finish to the new one.
+        Jobs the analysis itself failed are kept, so take() still reports them.
+        """
+        if self.__restarts >= self.MAX_RESTARTS:
+            raise BrokenProcessPool(f"The analysis workers died {self.__restarts + 1} times in a row")
+        self.__restarts += 1
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        self.__executor = self.__start()
+        for key, job in list(self.__jobs.items()):
+            if not job.done() or job.cancelled() or isinstance(job.exception(), BrokenProcessPool):
+                self.__discard(self.__jobs.pop(key))
+        self.__submit_pending()
+
+    def shutdown(self):
+        """
+        Cancel everything that hasn't started and release the results of jobs that have.
+        """
+        for job in self.__jobs.values():
+            self.__discard(job)
+        self.__requests, self.__jobs = {}, {}
+        self.__executor.shutdown(wait=True, cancel_futures=True)
+
+    def __discard(self, job):
+        if not job.cancel():
+            job.add_done_callback(_release_result)
+
+def _start_worker():
+    """
+    Worker entry point that does nothing, the initializer already warmed the worker up.
+    """
+
+def _analyze_into_shared_memory(path, settings, key, disk_cache):
+    """
+    Worker entry point. Analyze the track and move each of its arrays into a new shared memory block.
+    The blocks are unlinked by whoever attaches to them in the main process.
+
+    Returns:
+        tuple: The analysis metadata and a (block name, shape, dtype) tuple per array name.
+    """
+    analysis = audio_analysis.analyze_track(path, settings)
+    if disk_cache is not None:
+        disk_cache.put(key, analysis)
+
+    blocks = {}
+    for name, array in analysis.get_arrays().items():
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        block.close()
+        blocks[name] = (block.name, array.shape, array.dtype.str)
+
+    # Only the metadata and block names go back through the pipe
+    return analysis.get_metadata(), blocks
+
+def _attach_shared_array(name, shape, dtype):
+    """
+    Map a block created by a worker as a NumPy array without copying it.
+    The name is unlinked right away, the mapping itself lives until the array is garbage collected.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    block.unlink()
+
+    # Closing the block while the array still exists would leave it pointing at unmapped memory
+    weakref.finalize(array, block.close)
+    return array
+
+def _release_result(job):
+    """
+    Done callback for stale jobs. Free the shared memory blocks nobody is going to attach to.
+    """
+    if job.cancelled() or job.exception() is not None:
+        return
+    _, blocks = job.result()
+    for name, _, _ in blocks.values():
+        block = shared_memory.SharedMemory(name=name)
+        block.close()
+        block.unlink()
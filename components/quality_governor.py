@@ -0,0 +1,73 @@
+import numpy as np
+from collections import deque
+
+'''
+QualityGovernor picks the quality tier that keeps frames within their time budget.
+
+The time every frame took to draw goes into a rolling window. Once the window is full, the median frame
+time is compared to the budget: above lower_at of it the tier steps down (faster), below raise_at of it
+the tier steps back up. The gap between the two, and starting every tier with an empty window, keep the
+tier from flapping. If a raised tier turns out too slow right away, the next raise waits twice as many
+windows, up to MAX_WAIT.
+
+Args:
+        tiers: number of quality tiers, 0 is the best
+        frame_time: seconds a frame may take
+        window: number of frames the median frame time is taken over
+        lower_at, raise_at: parts of frame_time the median has to go above or below to change tiers
+'''
+class QualityGovernor:
+    MAX_WAIT = 16 # Most windows of headroom to wait for before raising the tier
+
+    def __init__(self, tiers, frame_time, window=60, lower_at=0.9, raise_at=0.5):
+        self.tiers = tiers
+        self.frame_time = frame_time
+        self.lower_at = lower_at
+        self.raise_at = raise_at
+        self.tier = 0
+        self.__times = deque(maxlen=window)
+        self.__raise_wait = 1 # Full windows of headroom needed before raising
+        self.__headroom = 0 # Full windows of headroom in a row
+        self.__raised = False # Whether the last change was a raise
+
+    def get_frame_time(self):
+        """
+        Return the median of the frame times in the window, 0 if it's empty.
+        """
+        return float(np.median(self.__times)) if self.__times else 0
+
+    def update(self, frame_time):
+        """
+        Add the seconds a frame took to draw.
+
+        Returns:
+            bool: Whether the tier changed.
+        """
+        self.__times.append(frame_time)
+        if len(self.__times) < self.__times.maxlen:
+            return False
+
+        median = self.get_frame_time()
+        if median > self.frame_time * self.lower_at and self.tier < self.tiers - 1:
+            if self.__raised:
+                self.__raise_wait = min(self.MAX_WAIT, self.__raise_wait * 2) # That tier was too slow, wait longer to try it again
+            self.tier += 1
+            self.__raised = False
+        elif median < self.frame_time * self.raise_at and self.tier > 0:
+            self.__headroom += 1
+            if self.__headroom < self.__raise_wait:
+                self.__times.clear()
+                return False
+            self.tier -= 1
+            self.__raised = True
+        else:
+            if self.__raised:
+                self.__raise_wait = 1 # Held up a full window, it was fine
+            self.__raised = False
+            self.__headroom = 0
+            return False
+
+        # Every tier is judged on its own frames
+        self.__headroom = 0
+        self.__times.clear()
+        return True
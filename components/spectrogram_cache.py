@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+from components.audio_analysis import Analysis
+
+'''
+Two-tier cache of finished analyses so a song is only ever analyzed once.
+
+The memory tier keeps the most recently used analyses in RAM, the disk tier persists them
+between runs. Both evict the least recently used entries once over their budget.
+'''
+
+def cache_key(path, settings, hash_contents=False):
+    """
+    Build the cache key of a song from its file identity and the analysis parameters.
+
+    Args:
+        path (str): Path of the audio file.
+        settings (AnalysisSettings): Parameters the analysis was or will be made with.
+        hash_contents (bool): Identify the file by a hash of its bytes instead of its path and mtime.
+            Slower, but survives moving or touching the file.
+    """
+    stat = os.stat(path)
+    if hash_contents:
+        contents = hashlib.sha1()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                contents.update(chunk)
+        identity = f"{stat.st_size}|{contents.hexdigest()}"
+    else:
+        identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(f"{identity}|{settings.key()}".encode()).hexdigest()
+
+'''
+Least recently used analyses held in RAM
+
+Args:
+        max_entries: maximum number of analyses to keep
+        max_bytes: maximum combined size of their arrays
+'''
+class MemoryCache:
+    def __init__(self, max_entries=8, max_bytes=512 * 1024**2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key):
+        analysis = self.__entries.get(key)
+        if analysis is not None:
+            self.__entries.move_to_end(key)
+        return analysis
+
+    def put(self, key, analysis):
+        if key in self.__entries:
+            self.__bytes -= self.__entries.pop(key).nbytes()
+        self.__entries[key] = analysis
+        self.__bytes += analysis.nbytes()
+
+        # Evict oldest first, but never the entry that was just added
+        while len(self.__entries) > 1 and (len(self.__entries) > self.max_entries or self.__bytes > self.max_bytes):
+            _, evicted = self.__entries.popitem(last=False)
+            self.__bytes -= evicted.nbytes()
+
+'''
+Analyses stored as .npy files in a directory. Each entry is one <key>.<array>.npy file per array
+plus a <key>.json file holding the metadata, written last so a half written entry is never read.
+The mtime of the .json file records when the entry was last used.
+
+Safe to share between processes: writes are atomic renames and vanished files count as misses.
+
+Args:
+        directory: folder to store the entries in
+        max_bytes: maximum combined size of all entries
+'''
+class DiskCache:
+    def __init__(self, directory, max_bytes=4 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def __contains__(self, key):
+        return os.path.exists(self.__path(key, "json"))
+
+    def touch(self, key):
+        """
+        Mark the entry under key as recently used without reading it. Returns False if there is none.
+        """
+        try:
+            os.utime(self.__path(key, "json"))
+        except OSError:
+            return False
+        return True
+
+    def __path(self, key, suffix):
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def get(self, key):
+        """
+        Return the analysis stored under key or None. Arrays are memory mapped, not read up front.
+        """
+        try:
+            with open(self.__path(key, "json")) as file:
+                metadata = json.load(file)
+            arrays = {name: np.load(self.__path(key, f"{name}.npy"), mmap_mode="r") for name in metadata["arrays"]}
+            os.utime(self.__path(key, "json")) # Mark as recently used
+        except (OSError, ValueError, KeyError):
+            return None
+        return Analysis.from_arrays(arrays, metadata)
+
+    def put(self, key, analysis, evict=True):
+        """
+        Store an analysis under key. evict=False skips the eviction scan, for writers that
+        store many entries in a row and call evict() once when they are done.
+        """
+        arrays = analysis.get_arrays()
+        for name, array in arrays.items():
+            self.__write(self.__path(key, f"{name}.npy"), lambda file: np.save(file, array))
+
+        metadata = dict(analysis.get_metadata(), arrays=list(arrays))
+        self.__write(self.__path(key, "json"), lambda file: file.write(json.dumps(metadata).encode()))
+        if evict:
+            self.evict()
+
+    def __write(self, path, write):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            write(file)
+        os.replace(temp_path, path)
+
+    def evict(self):
+        """
+        Remove least recently used entries until the directory fits in max_bytes. Costs one listdir and a stat per file.
+        """
+        entries = {}
+        for name in os.listdir(self.directory):
+            key = name.split(".", 1)[0]
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            size, last_used, names = entries.get(key, (0, None, []))
+            if name.endswith(".json"):
+                last_used = stat.st_mtime
+            names.append(name)
+            entries[key] = (size + stat.st_size, last_used, names)
+
+        total = sum(size for size, _, _ in entries.values())
+        # Entries without a .json file are still being written by another process, leave them alone
+        complete = sorted((last_used, key) for key, (_, last_used, _) in entries.items() if last_used is not None)
+        for _, key in complete[:-1]:
+            if total <= self.max_bytes:
+                break
+            size, _, names = entries[key]
+            # The .json file goes first, so a reader never finds an entry with missing arrays
+            for name in sorted(names, key=lambda name: not name.endswith(".json")):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            total -= size
+
+'''
+SpectrogramCache combines a MemoryCache and an optional DiskCache
+
+Args:
+        directory: folder for the disk tier, None to only cache in memory
+        max_entries, max_memory_bytes: budget of the memory tier
+        max_disk_bytes: budget of the disk tier
+        hash_contents: identify songs by the hash of their contents instead of path and mtime
+'''
+class SpectrogramCache:
+    def __init__(self, directory=None, max_entries=8, max_memory_bytes=512 * 1024**2, max_disk_bytes=4 * 1024**3, hash_contents=False):
+        self.memory = MemoryCache(max_entries, max_memory_bytes)
+        self.disk = DiskCache(directory, max_disk_bytes) if directory else None
+        self.hash_contents = hash_contents
+
+    def key(self, path, settings):
+        return cache_key(path, settings, self.hash_contents)
+
+    def __contains__(self, key):
+        return key in self.memory or (self.disk is not None and key in self.disk)
+
+    def get(self, key):
+        """
+        Look the key up in memory, then on disk. Disk hits are promoted to the memory tier.
+        """
+        analysis = self.memory.get(key)
+        if analysis is None and self.disk is not None:
+            analysis = self.disk.get(key)
+            if analysis is not None:
+                self.memory.put(key, analysis)
+        return analysis
+
+    def put(self, key, analysis, persist=True):
+        """
+        Store an analysis in both tiers. persist=False skips the disk tier for results already written there.
+        """
+        self.memory.put(key, analysis)
+        if persist and self.disk is not None:
+            self.disk.put(key, analysis)
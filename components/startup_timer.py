@@ -0,0 +1,43 @@
+import json
+import time
+
+'''
+StartupTimer measures how long each phase of startup takes until the first frame is on screen.
+
+Call mark() at the end of every phase. report() prints the phases and the total, the time to
+first frame, and can append them to a JSON lines log to track it across runs.
+
+Args:
+        start: perf_counter() value startup is measured from, now if None
+'''
+class StartupTimer:
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.phases = [] # (name, duration in ms) in order
+        self.__last = self.start
+
+    def mark(self, phase):
+        """
+        End the current phase and name it.
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.__last) * 1000))
+        self.__last = now
+
+    def get_total(self):
+        """
+        Return the time in ms from start to the last mark.
+        """
+        return (self.__last - self.start) * 1000
+
+    def report(self, log_path=None):
+        """
+        Print the duration of every phase, and append them to log_path as one JSON line if given.
+        """
+        phases = ", ".join(f"{name} {duration:.0f}ms" for name, duration in self.phases)
+        print(f"Startup: {phases} (first frame after {self.get_total():.0f}ms)")
+
+        if log_path is not None:
+            entry = {"time": time.time(), "total": self.get_total(), "phases": dict(self.phases)}
+            with open(log_path, "a") as log:
+                log.write(json.dumps(entry) + "\n")
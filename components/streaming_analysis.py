@@ -0,0 +1,190 @@
+import threading
+import numpy as np
+import soundfile
+from components.audio_analysis import AnalysisSettings, MIN_DECIBEL, ONSET_LAG, find_onsets, to_band_decibels
+
+'''
+StreamingAnalysis class analyzes a track block by block just ahead of the playback position.
+
+Only a sliding window of frames is kept, so memory stays the same no matter how long the track is.
+Decoding happens at the file's native sample rate (with STFT sizes scaled to match) on a background thread, and lookups outside
+the window (after seeking) make the thread restart the stream there. Onsets are found block by block and kept in a second ring
+next to the levels.
+
+Args:
+        path: path of the audio file, it must be readable by soundfile (see is_streamable)
+        settings: AnalysisSettings, the decode mode and dtype are ignored
+        window_seconds: amount of audio kept in memory
+        block_seconds: amount of audio decoded at once
+'''
+class StreamingAnalysis:
+    def __init__(self, path, settings=None, window_seconds=60, block_seconds=2):
+        settings = settings or AnalysisSettings()
+        info = soundfile.info(path)
+
+        self.path = path
+        self.sample_rate = info.samplerate
+        self.n_fft, self.hop_length = settings.get_stft_size(self.sample_rate)
+        self.length = info.duration * 1000
+        self.time_index_ratio = self.sample_rate / self.hop_length
+        self.freqs = settings.layout.freqs
+        self.__filterbank = settings.layout.filterbank(self.sample_rate, self.n_fft)
+        self.__columns = {freq: i for i, freq in enumerate(self.freqs)}
+
+        # Blocks are analyzed without padding, so frame i is centered n_fft / 2 samples later than with librosa.stft
+        self.__frame_offset = self.n_fft // (2 * self.hop_length)
+        self.__last_frame = max(0, (info.frames - self.n_fft) // self.hop_length) # Last full frame of the file
+        self.__block_frames = max(1, int(block_seconds * self.time_index_ratio))
+        self.__window_frames = max(2 * self.__block_frames, int(window_seconds * self.time_index_ratio))
+        self.__keep_behind = self.__window_frames // 4 # Frames kept before the playback position for short rewinds
+
+        # Time-major ring of band levels. Absolute frame i lives at row i % window_frames
+        self.__window = np.full((self.__window_frames, len(self.freqs)), MIN_DECIBEL, dtype=np.float32)
+        self.__onsets = np.zeros((self.__window_frames, len(self.freqs)), dtype=np.float16) # Onset strength, 0 for none
+        self.__silence = np.full(len(self.freqs), MIN_DECIBEL, dtype=np.float32)
+        self.__silence.flags.writeable = False
+        self.__start = 0 # First frame in the window
+        self.__end = 0 # One past the last decoded frame
+        self.__position = 0 # Last frame that was looked up
+        self.__seek_to = 0 # Frame to restart the stream at, None while streaming normally
+        self.__peak = 1e-10 # Largest amplitude seen so far, the running stand-in for ref=np.max
+        self.error = None # Exception that stopped the decoding thread, see check()
+
+        self.__condition = threading.Condition()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def get_frame(self, target_time, interpolate=False):
+        """
+        Get the decibel level of every band at a specific time (seconds).
+        Times outside the track are clamped to its first or last frame.
+        Returns the minimum level for frames that haven't been decoded yet.
+        With interpolate, times between two decoded frames blend them linearly.
+        """
+        position = min(max(0, target_time * self.time_index_ratio - self.__frame_offset), self.__last_frame)
+        frame = int(position)
+        if frame != self.__position:
+            self.__move_to(frame)
+
+        if not self.__start <= frame < self.__end:
+            return self.__silence
+
+        # Copy, the row is overwritten once it leaves the window
+        current = self.__window[frame % self.__window_frames].copy()
+        if interpolate and frame + 1 < self.__end:
+            following = self.__window[(frame + 1) % self.__window_frames]
+            current += (following - current) * (position - frame)
+        return current
+
+    def get_decibel(self, target_time, freq):
+        """
+        Get the decibel level at a specific time (seconds) and band frequency (Hz).
+        """
+        return self.get_frame(target_time)[self.__columns[float(freq)]]
+
+    def get_onsets(self, start_time, end_time):
+        """
+        Get the band index and strength arrays of the decoded onsets after start_time up to and including end_time (seconds).
+        """
+        first = max(self.__start, int(start_time * self.time_index_ratio - self.__frame_offset) + 1)
+        last = min(self.__end, int(end_time * self.time_index_ratio - self.__frame_offset) + 1)
+        if last <= first:
+            return np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.float16)
+        strengths = self.__onsets[np.arange(first, last) % self.__window_frames]
+        _, bands = np.nonzero(strengths)
+        return bands.astype(np.int16), strengths[strengths > 0]
+
+    def check(self):
+        """
+        Raise the error that stopped the decoding thread, if any. Call once per frame.
+        """
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """
+        Stop the decoding thread
+        """
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        self.__thread.join()
+
+    def __move_to(self, frame):
+        """
+        Record the new playback position. Wake the thread so it keeps decoding ahead, and
+        restart the stream if the position jumped out of the window or far past the decoded frames.
+        """
+        with self.__condition:
+            self.__position = frame
+            if frame < self.__start or frame > self.__end + 2 * self.__block_frames:
+                self.__seek_to = frame
+            self.__condition.notify()
+
+    def __run(self):
+        # A decode error ends the thread, it is kept for check() to raise on the render thread
+        try:
+            self.__decode()
+        except Exception as error:
+            self.error = error
+
+    def __decode(self):
+        import librosa # Imported here so creating the analysis never waits for it
+        stream = None
+        while True:
+            with self.__condition:
+                # Sleep until a seek is requested or there is room in front of the playback position
+                while self.__running and self.__seek_to is None and (stream is None or
+                        self.__end - self.__position >= self.__window_frames - self.__keep_behind):
+                    self.__condition.wait()
+                if not self.__running:
+                    break
+                if self.__seek_to is not None:
+                    self.__start = self.__end = self.__seek_to
+                    self.__seek_to = None
+                    stream = librosa.stream(self.path, block_length=self.__block_frames, frame_length=self.n_fft,
+                                            hop_length=self.hop_length, offset=self.__start / self.time_index_ratio, fill_value=0)
+
+            block = next(stream, None)
+            if block is None:
+                stream = None # End of file, wait for a seek
+                continue
+            self.__store(np.abs(librosa.stft(block, n_fft=self.n_fft, hop_length=self.hop_length, center=False)))
+
+    def __store(self, magnitudes):
+        """
+        Convert the bands of a block of STFT magnitudes to decibels and append them to the window.
+        """
+        self.__peak = max(self.__peak, float(magnitudes.max(initial=0)))
+        decibels = to_band_decibels(magnitudes, self.__filterbank, ref=self.__peak)
+
+        # The frames before the block are context for its first onsets
+        context = min(ONSET_LAG, self.__end - self.__start)
+        before = self.__window[np.arange(self.__end - context, self.__end) % self.__window_frames]
+        frames, bands, strengths = find_onsets(np.concatenate([before, decibels]))
+        in_block = frames >= context
+        onsets = np.zeros(decibels.shape, dtype=np.float16)
+        onsets[frames[in_block] - context, bands[in_block]] = strengths[in_block]
+
+        with self.__condition:
+            if self.__seek_to is not None:
+                return # Stale block from before the seek
+
+            # Advance the start first so readers never see a row that is being overwritten
+            end = self.__end + len(decibels)
+            self.__start = max(self.__start, end - self.__window_frames)
+            rows = np.arange(self.__end, end) % self.__window_frames
+            self.__window[rows] = decibels
+            self.__onsets[rows] = onsets
+            self.__end = end
+
+def is_streamable(path):
+    """
+    Whether the file can be decoded in blocks. Only formats supported by soundfile can.
+    """
+    try:
+        soundfile.info(path)
+        return True
+    except RuntimeError:
+        return False
@@ -0,0 +1,50 @@
+import pygame
+from collections import OrderedDict
+
+'''
+TextCache class keeps the fonts and rendered text of the menu, so the same text isn't rendered every frame.
+
+Fonts are created once per size. Rendered text is keyed by text, size and color, and the least recently
+used are evicted once there are more than max_texts. Whole strings are cached rather than single glyphs,
+menu text repeats exactly and rendering a string at once keeps its kerning.
+
+Args:
+        max_texts: maximum number of rendered texts to keep
+'''
+class TextCache:
+    def __init__(self, max_texts=512):
+        self.max_texts = max_texts
+        self.hits = 0
+        self.misses = 0
+        self.__fonts = {}
+        self.__texts = OrderedDict()
+
+    def __len__(self): return len(self.__texts)
+
+    def get_hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def get_font(self, size):
+        font = self.__fonts.get(size)
+        if font is None:
+            font = self.__fonts[size] = pygame.font.Font(size=size)
+        return font
+
+    def render(self, text, size, color):
+        """
+        Get text rendered antialiased in the default font, rendering it on a miss.
+        """
+        key = (text, size, color)
+        surface = self.__texts.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.__texts.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.get_font(size).render(text, True, color)
+        self.__texts[key] = surface
+        if len(self.__texts) > self.max_texts:
+            self.__texts.popitem(last=False)
+        return surface
@@ -0,0 +1,17 @@
+from components.band_layout import BandLayout
+
+'''
+Settings shared by main.py and the tools, so songs are analyzed and cached the same way everywhere.
+Only constants, importing this has no side effects.
+'''
+
+PLAYLIST = 'playlist' # Folder containing .mp3 and .wav files, subfolders included
+CACHE_DIR = 'cache' # Folder where analyzed songs are stored so they are only analyzed once
+CACHE_MAX_GB = 4 # Size of CACHE_DIR, the least recently played songs are removed past it
+PLAYLIST_INDEX = 'playlist_index.json' # Remembers which songs were validated between runs
+
+# Frequency bands shown by the bars: LINEAR, LOG, OCTAVE or MEL (see components.BandLayout)
+BAND_LAYOUT = BandLayout("LINEAR", bands=156, min_freq=200, max_freq=8000)
+
+# How songs are decoded for analysis: RESAMPLE, FAST, DECIMATE or NATIVE (see components.audio_analysis)
+DECODE_MODE = 'FAST'
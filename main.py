@@ -1,28 +1,56 @@
+import time
+START_TIME = time.perf_counter() # Startup is timed from before the imports
+
 import pygame
-import os
+import numpy as np
 import components
 import visuals
+# The playlist, cache, band layout and decode mode are set in config.py, the tools use them too
+from config import PLAYLIST, CACHE_DIR, CACHE_MAX_GB, PLAYLIST_INDEX, BAND_LAYOUT, DECODE_MODE
 
-PLAYLIST = 'playlist' # Folder containing .mp3 and .wav files
 HIDE_MENU = False
 
-def handle_key_presses(event, music_player):
+# None plays the playlist. 'microphone' or the path of an audio file visualizes it as a live stream instead
+LIVE_INPUT = None
+
+# File the startup phase timings are appended to as JSON lines, None to only print them
+STARTUP_LOG = None
+
+# Only clear and update the parts of the window that were drawn on, instead of the whole window every frame
+DIRTY_RECTS = False
+
+# Frames per second to draw at, None for the display's refresh rate, 0 for as fast as possible
+TARGET_FPS = None
+# Frames per second while paused, minimized, or nothing moves. Input still wakes the window up right away
+IDLE_FPS = 10
+# Frames in a row that must stay the same before drawing at IDLE_FPS, a live source can repeat a frame now and then
+IDLE_AFTER = 3
+# Wait for the display's refresh when updating it, the frame scheduler then doesn't sleep on top of it
+VSYNC = False
+
+# Lower the quality tier (sparks, glow, smoothing, bar count) when frames take longer than TARGET_FPS allows
+ADAPTIVE_QUALITY = True
+
+def toggle_menu():
     global HIDE_MENU
-    if event.type == pygame.KEYDOWN:
-        if event.key == pygame.K_RIGHT and pygame.key.get_mods() & pygame.KMOD_SHIFT: # SHIFT + R ARROW KEY
-            music_player.next()
-        elif event.key == pygame.K_LEFT and pygame.key.get_mods() & pygame.KMOD_SHIFT: # SHIFT + L ARROW KEY
-            music_player.prev()
-        elif event.key == pygame.K_RIGHT:
-            music_player.fast_forward(5)
-        elif event.key == pygame.K_LEFT:
-            music_player.rewind(5)
-        elif event.key == pygame.K_SPACE:
-            music_player.pause()
-        elif event.key == pygame.K_TAB:
-            HIDE_MENU = not HIDE_MENU
+    HIDE_MENU = not HIDE_MENU
+
+def get_key_bindings(audio_source):
+    """
+    Return what every key does, keyed by (key, whether SHIFT is held)
+    """
+    return {
+        (pygame.K_RIGHT, True): audio_source.next, # SHIFT + R ARROW KEY
+        (pygame.K_LEFT, True): audio_source.prev, # SHIFT + L ARROW KEY
+        (pygame.K_RIGHT, False): lambda: audio_source.fast_forward(5),
+        (pygame.K_LEFT, False): lambda: audio_source.rewind(5),
+        (pygame.K_SPACE, False): audio_source.pause,
+        (pygame.K_TAB, False): toggle_menu,
+    }
 
 def main(playlist):
+    startup = components.StartupTimer(START_TIME)
+    startup.mark("imports")
    
     # Set up the screen
     pygame.init()
@@ -30,57 +58,108 @@ def main(playlist):
     infoObject = pygame.display.Info()
     screen_w = int(infoObject.current_w / 2)
     screen_h = screen_w
-    screen = pygame.display.set_mode([screen_w, screen_h])
+    if VSYNC:
+        screen = pygame.display.set_mode([screen_w, screen_h], pygame.SCALED, vsync=1) # vsync needs SCALED or OPENGL
+    else:
+        screen = pygame.display.set_mode([screen_w, screen_h])
+    startup.mark("window")
 
     # Create visualizer
-    visualizer = visuals.Visualizer(screen, screen_w, screen_h)
+    visualizer = visuals.Visualizer(screen, screen_w, screen_h, BAND_LAYOUT.freqs)
 
     # Create buttons
     buttons = components.ButtonMenu(screen, visualizer)
 
-    # Create MusicPlayer object which contains entire playlist of songs
-    music_player = components.MusicPlayer(playlist)
-    music_player.play()
+    # Show the menu right away, the audio source may take a moment to start
+    screen.fill('Black')
+    if not HIDE_MENU:
+        buttons.update()
+    pygame.display.update()
+    startup.mark("menu")
+
+    # Create MusicPlayer object which contains entire playlist of songs, or a live stream source instead
+    if LIVE_INPUT is None:
+        audio_source = components.MusicPlayer(playlist, layout=BAND_LAYOUT, decode=DECODE_MODE, cache_dir=CACHE_DIR,
+                                            cache_max_bytes=CACHE_MAX_GB * 1024**3)
+        audio_source.play()
+    elif LIVE_INPUT == 'microphone':
+        audio_source = components.LiveAudioSource.from_microphone(BAND_LAYOUT)
+    else:
+        audio_source = components.LiveAudioSource.from_file(LIVE_INPUT, BAND_LAYOUT)
+    startup.mark("audio source")
     
-    # Initialize timing
-    last_frame_ticks = music_player.get_current_time()
+    # Initialize timing, song ticks only pick the frame and onsets, delta time comes from the scheduler's clock
+    last_frame_ticks = audio_source.get_current_time()
+    display = components.DirtyRegions(screen, DIRTY_RECTS)
+    scheduler = components.FrameScheduler(TARGET_FPS, IDLE_FPS, VSYNC)
+    governor = components.QualityGovernor(len(visualizer.QUALITY_TIERS), scheduler.get_frame_time())
+    dispatcher = components.InputDispatcher(get_key_bindings(audio_source))
+    last_frame = None
+    still_frames = 0
+    idle = False
 
     running = True
     while running:
 
-        # If the current song time is within 100ms of the length, go to next song to avoid OOB error
-        if((music_player.get_current_time()) >= music_player.get_length() - 100):
-            music_player.next()
+        # If the current song time is within 100ms of the length, go to next song before the mixer stops
+        if((audio_source.get_current_time()) >= audio_source.get_length() - 100):
+            audio_source.next()
             last_frame_ticks = 0
 
-        # Calculate time difference
-        current_ticks = music_player.get_current_time()
-        delta_time = (current_ticks - last_frame_ticks) / 1000.0
-        last_frame_ticks = current_ticks
+        # Pick up the song's analysis if it finished in the background
+        audio_source.update()
+
+        # Wait for the next frame, everything stands still while paused
+        delta_time = scheduler.tick(idle)
+        frame_start = time.perf_counter()
+        if audio_source.is_paused:
+            delta_time = 0
+        current_ticks = audio_source.get_current_time()
+        previous_ticks, last_frame_ticks = last_frame_ticks, current_ticks
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-        
-            handle_key_presses(event, music_player)
+        # Clicks and key presses are handled before anything is drawn, so they show on this frame
+        dispatcher.set_targets([] if HIDE_MENU else buttons.targets)
+        running = dispatcher.dispatch(pygame.event.get())
 
-        screen.fill('Black')
+        display.clear()
 
-        # Display bars
-        for i, freq in enumerate(visualizer.freq_range):
-            visualizer.update(delta_time, music_player.get_decibel(current_ticks / 1000.0, freq), i)
+        # Display bars, sparking on the onsets since the previous frame
+        onsets = audio_source.get_onsets(previous_ticks / 1000.0, current_ticks / 1000.0)
+        frame = audio_source.get_frame(current_ticks / 1000.0)
+        drawn = visualizer.update(delta_time, frame, onsets)
 
         # Display buttons
         if not HIDE_MENU:
-            buttons.update()
+            drawn += buttons.update()
+
+        # With vsync, presenting waits for the refresh, which isn't time spent drawing
+        draw_time = time.perf_counter() - frame_start
+        display.present(drawn)
+        if not VSYNC:
+            draw_time = time.perf_counter() - frame_start
+
+        # Idle frames are drawn at a lower rate on purpose, they say nothing about the quality that can be kept up
+        if ADAPTIVE_QUALITY and not idle and governor.update(draw_time):
+            visualizer.set_quality(governor.tier)
+
+        # Idle when the window can't be seen, or when the levels stayed the same for a few frames and nothing else moves
+        unchanged = audio_source.is_paused or (last_frame is not None and np.array_equal(frame, last_frame))
+        still_frames = still_frames + 1 if unchanged and visualizer.is_still() else 0
+        idle = not pygame.display.get_active() or still_frames >= IDLE_AFTER
+        last_frame = np.array(frame, copy=True) # Sources may reuse the array they return
 
-        pygame.display.update()
+        if startup is not None:
+            startup.mark("first frame")
+            startup.report(STARTUP_LOG)
+            startup = None
 
     pygame.quit()
+    audio_source.close()
 
 if __name__ == "__main__":
-    # Create the full path for each song/audio file
-    songs = os.listdir(PLAYLIST)
-    playlist = [os.path.join(PLAYLIST, song) for song in songs 
-                if os.path.isfile(os.path.join(PLAYLIST, song)) and song.lower().endswith(('.mp3', '.wav'))]
-    main(playlist)
\ No newline at end of file
+    # Find every song in the playlist folder, only new or changed files are checked again
+    index = components.PlaylistIndex(PLAYLIST, PLAYLIST_INDEX)
+    index.scan()
+    for path, error in index.get_broken().items():
+        print(f"Skipping {path}: {error}")
+    main(index.get_playable())
\ No newline at end of file
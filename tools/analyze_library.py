@@ -0,0 +1,95 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import config
+from components import audio_analysis
+from components.playlist_index import PlaylistIndex
+from components.spectrogram_cache import DiskCache, cache_key
+
+'''
+Analyze a whole library ahead of time so the MusicPlayer never has to.
+
+Runs the same analysis as the MusicPlayer, with the band layout and decode mode set in config.py,
+for every valid song in a folder on all cores, and stores the results in the disk cache the player
+reads. Songs already in the cache are skipped, so an interrupted run picks up where it stopped.
+The run stops before it starts if the library can't fit in the cache, as songs would evict each other.
+
+Run from the project folder:
+    python -m tools.analyze_library playlist
+'''
+
+def _analyze(path, settings, key, disk_cache):
+    """
+    Worker entry point. Analyze one song into the disk cache and return its duration in seconds.
+    """
+    analysis = audio_analysis.analyze_track(path, settings)
+    disk_cache.put(key, analysis, evict=False) # Evicted once at the end instead of scanning the cache per song
+    return analysis.length / 1000
+
+def analyze_library(paths, settings, disk_cache, workers):
+    """
+    Analyze every path not in disk_cache yet, printing progress as songs finish.
+
+    Returns:
+        tuple: Number of songs analyzed, hours of audio analyzed, seconds taken and {path: error} of failed songs.
+    """
+    jobs = {}
+    for path in paths:
+        key = cache_key(path, settings)
+        if not disk_cache.touch(key): # Cached songs are marked as used, so the eviction keeps them
+            jobs[path] = key
+    print(f"{len(paths) - len(jobs)} of {len(paths)} songs already analyzed, {len(jobs)} to go")
+
+    done, audio_hours, failed = 0, 0, {}
+    start = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {executor.submit(_analyze, path, settings, key, disk_cache): path for path, key in jobs.items()}
+        try:
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    audio_hours += future.result() / 3600
+                    done += 1
+                except Exception as error:
+                    failed[path] = str(error) or type(error).__name__
+
+                minutes = (time.perf_counter() - start) / 60
+                print(f"[{done + len(failed)}/{len(jobs)}] {done / minutes:.1f} songs/min, "
+                      f"{audio_hours / minutes:.2f} audio hours/min  {path}")
+        except KeyboardInterrupt:
+            executor.shutdown(wait=True, cancel_futures=True)
+            print("Interrupted, run again to continue")
+    disk_cache.evict()
+    return done, audio_hours, time.perf_counter() - start, failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze every song in a folder into the cache used by main.py")
+    parser.add_argument("folder", nargs="?", default=config.PLAYLIST, help="folder with .mp3 or .wav files, subfolders included")
+    parser.add_argument("--cache-dir", default=config.CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-gb", type=float, default=config.CACHE_MAX_GB, help="cache budget, CACHE_MAX_GB in config.py by default")
+    args = parser.parse_args()
+
+    index = PlaylistIndex(args.folder, config.PLAYLIST_INDEX if args.folder == config.PLAYLIST else None)
+    index.scan()
+    paths = index.get_playable()
+    if not paths:
+        parser.error(f"no playable .mp3 or .wav files in {args.folder}")
+
+    settings = audio_analysis.AnalysisSettings(layout=config.BAND_LAYOUT, decode=config.DECODE_MODE)
+    max_bytes = args.max_gb * 1024**3
+    expected_bytes = settings.get_nbytes(index.get_total_duration())
+    if expected_bytes > max_bytes:
+        parser.error(f"the library needs about {expected_bytes / 1024**3:.2f} GB of cache but the budget is {args.max_gb:g} GB, "
+                     f"raise --max-gb (and CACHE_MAX_GB in config.py, or the player evicts them again)")
+    disk_cache = DiskCache(args.cache_dir, max_bytes)
+    done, audio_hours, seconds, failed = analyze_library(paths, settings, disk_cache, args.workers)
+
+    print(f"Analyzed {done} songs ({audio_hours:.2f} hours of audio) in {seconds / 60:.1f} minutes")
+    if done:
+        print(f"{done / seconds * 60:.1f} songs/min, {audio_hours / seconds * 60:.2f} audio hours/min")
+    for path, error in failed.items():
+        print(f"Failed {path}: {error}")
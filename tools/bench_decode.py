@@ -0,0 +1,60 @@
+import argparse
+import os
+import time
+from components import audio_analysis
+
+'''
+Benchmark the decode modes of the analysis pipeline.
+
+Analyzes every file once per decode mode and reports decode time and total analysis time
+per minute of audio, plus the range of frame durations to check they stay consistent. The first file is analyzed once up front so library warm-up isn't counted.
+
+Run from the project folder:
+    python -m tools.bench_decode playlist
+'''
+
+def find_audio_files(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith(('.mp3', '.wav')))
+
+def benchmark(paths, modes):
+    audio_minutes = sum(audio_analysis.get_duration(path) for path in paths) / 60
+    audio_analysis.analyze_track(paths[0]) # Warm up JIT compiled code and caches
+
+    results = {}
+    for mode in modes:
+        settings = audio_analysis.AnalysisSettings(decode=mode)
+        decode_seconds = total_seconds = 0
+        frame_durations = []
+        for path in paths:
+            start = time.perf_counter()
+            audio_analysis.decode(path, settings)
+            decode_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            analysis = audio_analysis.analyze_track(path, settings)
+            total_seconds += time.perf_counter() - start
+            frame_durations.append(analysis.hop_length / analysis.sample_rate * 1000)
+        results[mode] = (decode_seconds / audio_minutes, total_seconds / audio_minutes, min(frame_durations), max(frame_durations))
+    return audio_minutes, results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report analysis time per minute of audio for each decode mode")
+    parser.add_argument("folder", help="folder with .mp3 or .wav files")
+    parser.add_argument("--modes", nargs="+", default=audio_analysis.DECODE_MODES, choices=audio_analysis.DECODE_MODES)
+    args = parser.parse_args()
+
+    # Per minute figures need every file's duration, files without one can't be read anyway
+    paths = []
+    for path in find_audio_files(args.folder):
+        if audio_analysis.get_duration(path) is None:
+            print(f"Skipping {path}: unknown duration")
+        else:
+            paths.append(path)
+    if not paths:
+        parser.error(f"no readable .mp3 or .wav files in {args.folder}")
+
+    audio_minutes, results = benchmark(paths, args.modes)
+    print(f"{len(paths)} files, {audio_minutes:.1f} minutes of audio")
+    print(f"{'mode':<10}{'decode s/min':>14}{'total s/min':>14}{'frame ms':>16}")
+    for mode, (decode_seconds, total_seconds, shortest_frame, longest_frame) in results.items():
+        print(f"{mode:<10}{decode_seconds:>14.3f}{total_seconds:>14.3f}{shortest_frame:>9.2f}-{longest_frame:.2f}")
@@ -0,0 +1,66 @@
+import argparse
+import os
+import time
+import numpy as np
+import pygame
+import components
+
+'''
+Measure how the mixer clock behaves against rendered frames.
+
+Plays a song through the MusicPlayer and renders blank frames at a fixed rate while recording the
+raw mixer position, the smoothed render time and the wall clock of every frame. Reports how coarse
+the mixer position is, how often frames would repeat a timestamp without smoothing, and how far the
+mixer drifts from the wall clock.
+
+Run from the project folder:
+    python -m tools.measure_drift playlist/song.mp3 --seconds 20 --fps 144
+'''
+
+def measure(path, seconds, fps):
+    pygame.init()
+    screen = pygame.display.set_mode((320, 240))
+    clock = pygame.time.Clock()
+    music_player = components.MusicPlayer([path], workers=0)
+    music_player.play()
+
+    wall, raw, smoothed = [], [], []
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        pygame.event.pump()
+        wall.append((time.perf_counter() - start) * 1000)
+        raw.append(music_player.get_mixer_time())
+        smoothed.append(music_player.get_current_time() + music_player.get_latency())
+        screen.fill('Black')
+        pygame.display.flip()
+        clock.tick(fps)
+
+    latency = music_player.get_latency()
+    music_player.stop()
+    music_player.close()
+    pygame.quit()
+    return np.array(wall), np.array(raw), np.array(smoothed), latency
+
+def report(wall, raw, smoothed, latency):
+    raw_steps = np.diff(raw)
+    frame_times = np.diff(wall)
+    drift_slope = np.polyfit(wall, raw - wall, 1)[0] # ms of drift per ms of wall time
+
+    print(f"frames rendered:              {len(wall)} ({1000 / frame_times.mean():.1f} fps)")
+    print(f"mixer position step:          {np.median(raw_steps[raw_steps > 0]):.1f} ms median")
+    print(f"frames repeating mixer time:  {100 * np.mean(raw_steps == 0):.1f}% raw, {100 * np.mean(np.diff(smoothed) == 0):.1f}% smoothed")
+    print(f"smoothed - mixer:             {np.mean(smoothed - raw):.1f} ms mean, {np.max(np.abs(smoothed - raw)):.1f} ms max")
+    print(f"smoothed frame step jitter:   {np.std(np.diff(smoothed) - frame_times):.2f} ms (raw {np.std(raw_steps - frame_times):.2f} ms)")
+    print(f"mixer vs wall clock drift:    {drift_slope * 60000:.1f} ms per minute")
+    print(f"latency compensation in use:  {latency:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report drift between the mixer clock and rendered frames")
+    parser.add_argument("path", help="audio file to play")
+    parser.add_argument("--seconds", type=float, default=15, help="how long to measure")
+    parser.add_argument("--fps", type=int, default=144, help="frame rate to render at")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.path):
+        parser.error(f"{args.path} is not a file")
+    report(*measure(args.path, args.seconds, args.fps))
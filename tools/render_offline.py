@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # No window, set before pygame starts
+
+import pygame
+import config
+import visuals
+from components import audio_analysis
+from components.spectrogram_cache import DiskCache, cache_key
+
+'''
+Render a song's visualization to frames without playing it, as fast as the CPU allows.
+
+Time doesn't come from the mixer, frame i is drawn at i / fps seconds of the song's analysis, with the
+band layout and decode mode set in config.py. The analysis is read from the disk cache main.py uses, and
+made and stored there if the song wasn't analyzed yet. Frames are written as one raw RGB stream
+(frames.rgb) or as a PNG sequence, next to a settings.json with everything needed to read them back.
+
+Run from the project folder:
+    python -m tools.render_offline playlist/song.mp3 render --fps 60 --preset "LIGHT SHOW"
+
+A raw stream can be turned into a video with the song as sound, with the size and fps from settings.json:
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 960x960 -r 60 -i render/frames.rgb -i playlist/song.mp3 -shortest song.mp4
+'''
+
+PRESETS = ["DEFAULT", "BLACK HOLE", "SPACE", "LIGHT SHOW", "FIRE", "RAIN"]
+FORMATS = ["raw", "png"]
+
+def load_analysis(path, settings, cache_dir):
+    """
+    Return the analysis of path from the disk cache, analyzing and storing it on a miss.
+    """
+    disk_cache = DiskCache(cache_dir, config.CACHE_MAX_GB * 1024**3)
+    key = cache_key(path, settings)
+    analysis = disk_cache.get(key)
+    if analysis is None:
+        print(f"Analyzing {path}")
+        analysis = audio_analysis.analyze_track(path, settings)
+        disk_cache.put(key, analysis)
+    return analysis
+
+def render(analysis, out_dir, size, fps, frame_format, seconds=None, preset=None, visual_type=None):
+    """
+    Draw every frame of the analysis on a fixed timestep and write them to out_dir.
+
+    Returns:
+        tuple: Number of frames written and seconds it took.
+    """
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    visualizer = visuals.Visualizer(screen, size[0], size[1], analysis.freqs)
+    if preset is not None:
+        visualizer.change_preset(preset)
+    if visual_type is not None:
+        visualizer.change_visual_type(visuals.VisualType[visual_type])
+
+    length = analysis.length / 1000 if seconds is None else min(seconds, analysis.length / 1000)
+    frames = int(length * fps)
+    delta_time = 1 / fps
+    stream = open(os.path.join(out_dir, "frames.rgb"), "wb") if frame_format == "raw" else None
+
+    start = time.perf_counter()
+    try:
+        for i in range(frames):
+            # Onsets after the last frame up to this one, the first frame includes the ones at 0
+            current_time = i * delta_time
+            onsets = analysis.get_onsets(current_time - delta_time, current_time)
+            screen.fill('Black')
+            visualizer.update(delta_time, analysis.get_frame(current_time, interpolate=True), onsets)
+
+            if stream is not None:
+                stream.write(pygame.image.tobytes(screen, "RGB"))
+            else:
+                pygame.image.save(screen, os.path.join(out_dir, f"frame_{i:06d}.png"))
+
+            if (i + 1) % (fps * 10) == 0:
+                elapsed = time.perf_counter() - start
+                print(f"[{i + 1}/{frames}] {(i + 1) / elapsed:.1f} fps, {(i + 1) / fps / elapsed:.2f}x real time")
+    finally:
+        if stream is not None:
+            stream.close()
+        pygame.quit()
+    return frames, time.perf_counter() - start
+
+def write_settings(out_dir, path, settings, size, fps, frame_format, frames, preset, visual_type):
+    sidecar = {
+        "audio": os.path.abspath(path),
+        "format": frame_format,
+        "file": "frames.rgb" if frame_format == "raw" else "frame_%06d.png",
+        "pixel_format": "rgb24",
+        "width": size[0],
+        "height": size[1],
+        "fps": fps,
+        "frames": frames,
+        "preset": preset,
+        "visual_type": visual_type,
+        "analysis": settings.key(),
+    }
+    with open(os.path.join(out_dir, "settings.json"), "w") as file:
+        json.dump(sidecar, file, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a song's visualization to frames faster than real time")
+    parser.add_argument("path", help="audio file to render")
+    parser.add_argument("out_dir", help="folder to write the frames and settings.json to")
+    parser.add_argument("--format", choices=FORMATS, default="raw", help="one raw RGB stream or a PNG per frame")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--size", type=int, nargs=2, default=[960, 960], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--seconds", type=float, help="only render the start of the song")
+    parser.add_argument("--preset", choices=PRESETS)
+    parser.add_argument("--visual-type", choices=[visual_type.name for visual_type in visuals.VisualType])
+    parser.add_argument("--cache-dir", default=config.CACHE_DIR)
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.path):
+        parser.error(f"{args.path} is not a file")
+    if args.fps <= 0:
+        parser.error("--fps must be positive")
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    settings = audio_analysis.AnalysisSettings(layout=config.BAND_LAYOUT, decode=config.DECODE_MODE)
+    analysis = load_analysis(args.path, settings, args.cache_dir)
+    frames, seconds = render(analysis, args.out_dir, tuple(args.size), args.fps, args.format, args.seconds, args.preset, args.visual_type)
+    write_settings(args.out_dir, args.path, settings, tuple(args.size), args.fps, args.format, frames, args.preset, args.visual_type)
+
+    audio_seconds = frames / args.fps
+    print(f"Rendered {frames} frames ({audio_seconds:.1f}s of audio) in {seconds:.1f}s")
+    if seconds:
+        print(f"{frames / seconds:.1f} fps, {audio_seconds / seconds:.2f}x real time")
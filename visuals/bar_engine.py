@@ -0,0 +1,400 @@
+import pygame
+import math
+import numpy as np
+from visuals.circle_layout import CircleLayout
+from visuals.glow_cache import GlowCache
+from visuals.spark import SparkPool
+from visuals.visual_type import VisualType
+
+'''
+Bar engine class. Holds every audio bar and moves them all at once.
+
+The state of each bar (height, position, angle) lives in NumPy arrays, and one vectorized step per frame
+moves every bar toward its decibel level, so the cost of a frame barely grows with the number of bars.
+Properties changed from the menu are shared by all bars. Rotating doesn't move bars around, it shifts
+which band drives which bar by an offset. With a bar step above 1 every bar shows the loudest of bar_step
+neighbouring bands, so there are fewer bars to draw.
+ Args:
+        screen: screen to draw/render on
+        screen_w, screen_h: width and height of screen
+        freqs: sound frequency of every bar, in order
+        radius: radius of circle for circle visuals
+        visual_type: initial VisualType
+'''
+class BarEngine:
+    def __init__(self, screen, screen_w, screen_h, freqs, radius, visual_type=VisualType.BOTTOM):
+        self.__visual_type = visual_type
+        self.screen = screen
+        self.screen_w, self.screen_h = screen_w, screen_h
+        self.freqs = np.asarray(freqs)
+        self.bands = len(self.freqs)
+        self.bar_step = 1 # Bands shown by every bar
+        self.count = self.bands
+        self.width = screen_w / self.count # Make sure all bars can fit on screen horizontaly
+        self.radius = radius
+        self.min_height = 1
+        self.max_height = 200
+        self.min_decibel = -80
+        self.max_decibel = 0
+        self.shrink_speed = 0.05
+        self.grow_speed = 0.05
+        self.color = pygame.Color((255,255,255))
+        self.__decibel_height_ratio = (self.max_height - self.min_height) / (self.max_decibel - self.min_decibel)
+
+        # Per bar state, bar i is drawn at x[i] or layout.angles[i] and shows band (i + offset) % count
+        self.x = np.cumsum(np.full(self.count, self.width)) - self.width # Summed like the width of every bar before it
+        self.y = np.full(self.count, screen_h / 2)
+        self.layout = CircleLayout((screen_w // 2, screen_h // 2), self.count)
+        self.levels = np.full(self.count, float(self.min_height)) # Heights the bars move towards their decibel levels with
+        self.heights = self.levels.copy() # Heights drawn, the levels after filtering
+        self.peaks = None # Peak hold cap heights, when the filter is on
+        self.offset = 0
+        self.__settled = False # Every level reached the height of its decibel level
+
+        # Save original values if they need to be reset
+        self.ring_size = 0.99
+        self.ring_radius = self.radius
+        self.__original_width = self.width
+        self.__original_grow_speed = self.grow_speed
+        self.__original_shrink_speed = self.shrink_speed
+        self.__original_max_height = self.max_height
+        self.__origingal_min_height = self.min_height
+        self.__original_radius = self.radius
+
+        # Glow properties
+        self.glow_enabled = False
+        self.glow_intensity = 0.5
+        self.glow_length = 0.2
+        self.glow_blend = False # Blend the glow of circular types with the screen instead of drawing it over
+        self.glow = GlowCache()
+
+        self.sparks = SparkPool() # Sparks of all bars
+        self.__spark_ticks = np.full(self.count, float(self.sparks.properties.spawn_rate)) # Frames since each bar's last spark
+
+    def __len__(self): return self.count
+    def is_settled(self): return self.__settled
+
+    def get_visual_type(self): return self.__visual_type
+    def set_type(self, visual_type): self.__visual_type = visual_type
+
+    def set_bar_step(self, step):
+        """
+        Show step bands with every bar. The bar width grows to keep the bars filling the screen.
+        """
+        if step == self.bar_step:
+            return
+        # Every new bar starts where the old bar showing its first band was
+        previous = np.minimum(np.arange(self.bands // step) * step // self.bar_step, self.count - 1)
+        self.width *= step / self.bar_step
+        self.__original_width *= step / self.bar_step
+        self.bar_step = step
+        self.count = self.bands // step
+
+        self.x = np.arange(self.count) * (self.screen_w / self.count)
+        self.y = np.full(self.count, self.screen_h / 2)
+        self.layout.set_count(self.count)
+        self.levels = self.levels[previous]
+        self.heights = self.levels.copy()
+        self.peaks = None
+        self.offset %= self.count
+        self.__spark_ticks = self.__spark_ticks[previous]
+        self.__place_bars()
+
+    def __group_bands(self, values):
+        # Loudest value of the bands of every bar
+        values = np.asarray(values, dtype=float)
+        if self.bar_step == 1:
+            return values
+        return values[:self.count * self.bar_step].reshape(self.count, self.bar_step).max(axis=1)
+
+    def update(self, delta_time, decibels, color, onsets):
+        """
+        Move every bar toward the height of its decibel level and spark the bars whose band had an onset.
+
+        Args:
+            delta_time (float): Seconds since the last frame.
+            decibels (np.ndarray): Decibel level of every band.
+            color (pygame.Color): Color of the bars this frame.
+            onsets (np.ndarray): Onset strength (dB) of every band this frame, 0 for none.
+        """
+        decibels = np.roll(self.__group_bands(decibels), -self.offset)
+        desired_heights = decibels * self.__decibel_height_ratio + self.max_height
+        speeds = np.where(desired_heights > self.levels, self.grow_speed, self.shrink_speed)
+        self.levels += (desired_heights - self.levels) / speeds * delta_time
+        np.clip(self.levels, self.min_height, self.max_height, out=self.levels)
+        # Within half a pixel the bars don't visibly move any more
+        self.__settled = np.abs(np.clip(desired_heights, self.min_height, self.max_height) - self.levels).max() < 0.5
+        self.heights = self.levels.copy()
+        self.peaks = None
+        self.color = color
+        self.__place_bars()
+
+        if self.sparks.gen_sparks:
+            self.__update_sparks(delta_time, np.roll(self.__group_bands(onsets), -self.offset))
+
+    def __update_sparks(self, delta_time, onsets):
+        self.sparks.update_sparks(delta_time, self.screen_w, self.screen_h)
+
+        # Only bars with an onset that are above the height threshold can spark, and not while paused
+        properties = self.sparks.properties
+        if delta_time > 0:
+            # If frames since the last spark creation is greater than the spawn rate, reset them, and create a burst
+            ready = (onsets > 0) & (self.heights > self.max_height * properties.threshold) & (self.__spark_ticks > properties.spawn_rate)
+            bars = np.flatnonzero(ready)
+            if len(bars):
+                self.__spark_ticks[bars] = 0
+                # Strongest onsets first, so they are the ones created if the budget runs out
+                bars = bars[np.argsort(-onsets[bars], kind="stable")]
+                bursts = np.maximum(1, (onsets[bars] / 6).astype(int))
+                self.sparks.create_sparks(*self.__get_spark_positions_and_directions(np.repeat(bars, bursts)), self.color)
+        self.__spark_ticks += 1
+
+    def __get_spark_positions_and_directions(self, bars):
+        """
+        Get the inital spark positions and flying directions of the bars based on the current visual type
+        """
+        heights = self.heights[bars]
+
+        # Circular types start at the end of the bar and fly the way the bar points
+        if self.__visual_type in CircleLayout.GEOMETRY:
+            _, _, spark_x, spark_y = self.layout.get_line_ends(self.__visual_type, self.radius, heights, bars)
+            direction = self.layout.get_direction(self.__visual_type)
+            return spark_x, spark_y, direction * self.layout.cos[bars], direction * self.layout.sin[bars]
+
+        spark_x, spark_y = self.x[bars], self.y[bars].copy() # Start at same position as bar by default
+        direction_y = np.ones(len(bars)) # Falls by default
+
+        # Spark starts at bottom of bar
+        if self.__visual_type == VisualType.TOP:
+            spark_y += heights
+
+        # Spark randomly starts at top or bottom and falls or rises
+        elif self.__visual_type == VisualType.MIDDLE:
+            rises = np.random.random(len(bars)) < 0.5
+            spark_y += np.where(rises, 0, heights)
+            direction_y[rises] = -1
+
+        # Spark starts at top of bar and rises
+        if self.__visual_type == VisualType.BOTTOM:
+            direction_y = -direction_y
+
+        return spark_x, spark_y, np.zeros(len(bars)), direction_y # Only vertical movement
+
+    def apply_filters(self, filters, delta_time, skip=()):
+        """
+        Run the heights through a FilterChain, call after update and before render.
+        """
+        self.heights = filters.apply(self.heights, delta_time, self.min_height, self.max_height, skip)
+        self.peaks = filters.peaks
+        self.__place_bars()
+
+    def __place_bars(self):
+        """
+        Set the y of every bar of a rectangular visual type from its height
+        """
+        if self.__visual_type == VisualType.BOTTOM:
+            self.y = self.screen_h - self.heights
+        elif self.__visual_type == VisualType.TOP:
+            self.y = np.zeros(self.count)
+        elif self.__visual_type == VisualType.MIDDLE:
+            self.y = (self.screen_h - self.heights) / 2
+
+    def rotate(self):
+        """
+        Shift every band over to the next bar
+        """
+        self.offset = (self.offset + 1) % self.count
+
+    def reset_rotation(self):
+        self.offset = 0
+
+    def __get_line_ends(self):
+        """
+        Return the start and end coordinates of every bar of a circular visual type, and the line width and ring radius.
+        """
+        start_x, start_y, end_x, end_y = self.layout.get_line_ends(self.__visual_type, self.radius, self.heights)
+        ring_radius, width = self.layout.get_ring(self.__visual_type, self.ring_radius, self.width)
+        return start_x.astype(int), start_y.astype(int), end_x.astype(int), end_y.astype(int), int(width), ring_radius
+
+    def render(self):
+        """
+        Draw the bars, their glow and the sparks.
+
+        Returns:
+            list: Rectangles drawn on.
+        """
+        if self.__visual_type in (VisualType.BOTTOM, VisualType.TOP, VisualType.MIDDLE):
+            for x, y, height in zip(self.x.tolist(), self.y.tolist(), self.heights.tolist()):
+                pygame.draw.rect(self.screen, self.color, (x, y, self.width, height))
+            if self.peaks is not None:
+                self.__render_rect_peaks()
+            if self.glow_enabled and self.glow.passes:
+                self.__render_rect_glow()
+
+        elif self.__visual_type in (VisualType.CIRCLE, VisualType.CIRCLE_INNER, VisualType.CIRCLE_MIDDLE):
+            start_x, start_y, end_x, end_y, width, ring_radius = self.__get_line_ends()
+            center = self.layout.center
+            pygame.draw.circle(self.screen, self.color, center, ring_radius)
+            pygame.draw.circle(self.screen, 'Black', center, ring_radius * self.ring_size)
+
+            lines = zip(start_x.tolist(), start_y.tolist(), end_x.tolist(), end_y.tolist())
+            for x1, y1, x2, y2 in lines:
+                pygame.draw.line(self.screen, self.color, (x1, y1), (x2, y2), width)
+            if self.peaks is not None:
+                self.__render_line_peaks(width)
+            if self.glow_enabled and self.glow.passes:
+                self.__render_line_glow(end_x, end_y, width)
+
+        rects = [self.__get_bounds()]
+        spark_rect = self.sparks.render_sparks(self.screen)
+        if spark_rect is not None:
+            rects.append(spark_rect)
+        return rects
+
+    def __get_bounds(self):
+        """
+        Return a rectangle around everything the bars, caps and glow were drawn on this frame
+        """
+        height = float(self.heights.max())
+        # Glow strips are rounded to LENGTH_STEP per segment, so they can be a little longer
+        glow = self.glow.passes * (self.glow_length * height + GlowCache.LENGTH_STEP) if self.glow_enabled else 0
+        peak = float(self.peaks.max()) + 2 if self.peaks is not None else 0
+
+        if self.__visual_type in CircleLayout.GEOMETRY:
+            # Furthest any line, glow or cap gets from the base circle, inwards counts as outwards
+            base, start, end, _, _ = CircleLayout.GEOMETRY[self.__visual_type]
+            reach = max(abs(start) * height, abs(end) * height + glow, abs(end) * peak)
+            ring_radius, width = self.layout.get_ring(self.__visual_type, self.ring_radius, self.width)
+            distance = int(max(ring_radius, self.radius * base + reach) + width) + 1
+            center_x, center_y = self.layout.center
+            return pygame.Rect(center_x - distance, center_y - distance, 2 * distance + 1, 2 * distance + 1)
+
+        # Glow and caps go past the end of the bars, on both sides for MIDDLE
+        reach = int(max(height + glow, peak)) + 2
+        left, right = int(self.x.min()), int(self.x.max() + self.width) + 1
+        if self.__visual_type == VisualType.BOTTOM:
+            return pygame.Rect(left, self.screen_h - reach, right - left, reach)
+        elif self.__visual_type == VisualType.TOP:
+            return pygame.Rect(left, 0, right - left, reach)
+        return pygame.Rect(left, self.screen_h // 2 - reach, right - left, 2 * reach)
+
+    def __render_rect_peaks(self):
+        # A 2 pixel cap just past the end of the bar at its peak
+        if self.__visual_type == VisualType.BOTTOM:
+            caps = [self.screen_h - self.peaks - 2]
+        elif self.__visual_type == VisualType.TOP:
+            caps = [self.peaks]
+        else:
+            caps = [(self.screen_h - self.peaks) / 2 - 2, (self.screen_h + self.peaks) / 2]
+        for y in caps:
+            for x, cap_y in zip(self.x.tolist(), y.tolist()):
+                pygame.draw.rect(self.screen, self.color, (x, cap_y, self.width, 2))
+
+    def __render_line_peaks(self, width):
+        # A 2 pixel cap just past the end of the line at its peak, bars of CIRCLE_MIDDLE only get the outer one
+        _, _, start_x, start_y = self.layout.get_line_ends(self.__visual_type, self.radius, self.peaks)
+        _, _, end_x, end_y = self.layout.get_line_ends(self.__visual_type, self.radius, self.peaks + 2)
+        caps = zip(start_x.astype(int).tolist(), start_y.astype(int).tolist(), end_x.astype(int).tolist(), end_y.astype(int).tolist())
+        for x1, y1, x2, y2 in caps:
+            pygame.draw.line(self.screen, self.color, (x1, y1), (x2, y2), width)
+
+    def __get_glow_color(self):
+        step = GlowCache.COLOR_STEP
+        return tuple(min(255, round(channel / step) * step) for channel in (self.color.r, self.color.g, self.color.b))
+
+    def __render_rect_glow(self):
+        # Non circular types blit a pre-rendered SRCALPHA gradient strip above and/or below every bar
+        step = GlowCache.LENGTH_STEP
+        lengths = (np.round(self.heights * self.glow_length / step) * step).astype(int)
+        visible = np.flatnonzero((lengths > 0) & (self.heights > 0))
+        if len(visible) == 0:
+            return
+        lengths = lengths[visible]
+        x = self.x[visible].astype(int).tolist()
+        color, intensity, width = self.__get_glow_color(), round(self.glow_intensity, 3), int(self.width)
+
+        # Look up each distinct strip once
+        unique_lengths, inverse = np.unique(lengths, return_inverse=True)
+        blits = []
+        if self.__visual_type in (VisualType.BOTTOM, VisualType.MIDDLE):
+            # Glow rises from the top of the bar, brightest at the bottom of the strip
+            strips = np.empty(len(unique_lengths), dtype=object)
+            strips[:] = [self.glow.get_strip(width, length, color, intensity, False) for length in unique_lengths.tolist()]
+            y = (self.y[visible] - lengths * self.glow.passes).astype(int).tolist()
+            blits += zip(strips[inverse].tolist(), zip(x, y))
+        if self.__visual_type in (VisualType.TOP, VisualType.MIDDLE):
+            # Glow hangs from the bottom of the bar, brightest at the top of the strip
+            strips = np.empty(len(unique_lengths), dtype=object)
+            strips[:] = [self.glow.get_strip(width, length, color, intensity, True) for length in unique_lengths.tolist()]
+            y = (self.y[visible] + self.heights[visible]).astype(int).tolist()
+            blits += zip(strips[inverse].tolist(), zip(x, y))
+        self.screen.fblits(blits)
+
+    def __render_line_glow(self, end_x, end_y, width):
+        # Circular types can't use SRCALPHA surfaces because of preformance issues with the draw.line on a surface.
+        # Unless blending, the glow is drawn straight on the screen in darker colors.
+        # With blending it is drawn on a black layer that is then added to the screen, which blends like alpha over the black background
+        step = self.layout.get_direction(self.__visual_type) * self.heights * self.glow_length
+        step_x, step_y = step * self.layout.cos, step * self.layout.sin
+
+        target = self.screen
+        if self.glow_blend:
+            # Only clear and blend the part of the layer the glow can reach
+            far_x, far_y = end_x + step_x * self.glow.passes, end_y + step_y * self.glow.passes
+            left, top = int(min(end_x.min(), far_x.min())) - width, int(min(end_y.min(), far_y.min())) - width
+            right, bottom = int(max(end_x.max(), far_x.max())) + width, int(max(end_y.max(), far_y.max())) + width
+            area = pygame.Rect(left, top, right - left + 1, bottom - top + 1).clip(self.screen.get_rect())
+            target = self.glow.get_layer(self.screen.get_size())
+            target.fill((0, 0, 0), area)
+
+        # Every glow segment starts where the last one ended, beginning at the end of the bar
+        color = self.color
+        start_x, start_y = end_x, end_y
+        for i in range(1, self.glow.passes + 1):
+            color = pygame.Color(math.ceil(color.r * self.glow_intensity), math.ceil(color.g * self.glow_intensity),
+                                 math.ceil(color.b * self.glow_intensity), 0)
+            glow_x, glow_y = (end_x + step_x * i).astype(int), (end_y + step_y * i).astype(int)
+            for x1, y1, x2, y2 in zip(start_x.tolist(), start_y.tolist(), glow_x.tolist(), glow_y.tolist()):
+                pygame.draw.line(target, color, (x1, y1), (x2, y2), width)
+            start_x, start_y = glow_x, glow_y
+
+        if self.glow_blend:
+            self.screen.blit(target, area.topleft, area, pygame.BLEND_RGB_ADD)
+
+    def change_bar_properties(self, option, value):
+        """
+        Change properties on button press
+        Make sure to update the decible height ratio when max or min height is changed
+        """
+        if "BAR WIDTH" in option:
+            self.width = max(0, self.width + value)
+        elif "MAX" in option:
+            self.max_height = max(0, self.max_height + value)
+            self.__decibel_height_ratio = (self.max_height - self.min_height) / (self.max_decibel - self.min_decibel)
+        elif "MIN" in option:
+            self.min_height = max(0, self.min_height + value)
+            self.__decibel_height_ratio = (self.max_height - self.min_height) / (self.max_decibel - self.min_decibel)
+        elif "GROW" in option:
+            self.grow_speed = max(0.01, self.grow_speed + value)
+        elif "SHRINK" in option:
+            self.shrink_speed = max(0.01, self.shrink_speed + value)
+        elif "RESET BARS" in option:
+            self.width = self.__original_width
+            self.max_height = self.__original_max_height
+            self.min_height = self.__origingal_min_height
+            self.grow_speed = self.__original_grow_speed
+            self.shrink_speed = self.__original_shrink_speed
+            self.__decibel_height_ratio = (self.max_height - self.min_height) / (self.max_decibel - self.min_decibel)
+        elif "RING WIDTH" in option:
+            self.ring_size = min(1, self.ring_size + value)
+        elif "RING RADIUS" in option:
+            self.ring_radius = max(0, self.ring_radius + value)
+        elif "RADIUS" in option:
+            self.radius = max(0, self.radius + value)
+        elif "RESET CIRCLE" in option:
+            self.radius = self.__original_radius
+            self.ring_radius = self.__original_radius
+            self.ring_size = 0.99
+
+    def change_spark_property(self, option, value):
+        self.sparks.change_spark_property(option, value)
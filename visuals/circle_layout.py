@@ -0,0 +1,79 @@
+import math
+import numpy as np
+from visuals.visual_type import VisualType
+
+'''
+CircleLayout class holds the geometry of the circular visual types, so it isn't recomputed every frame.
+
+Bar i stands at angle 2 * pi * i / count around the center. The unit direction of every bar is computed
+once per bar count, and the base point of every bar (where its line starts from) once per visual type and
+radius. A bar's line then runs from base + start * height to base + end * height along its direction, and
+its sparks and glow leave from the end of the line, so every end point is a single array expression.
+
+Args:
+        center: (x, y) center of the circle on screen
+        count: number of bars
+'''
+class CircleLayout:
+    # Distance of the base point from the center as a multiple of the radius, where the line starts and ends
+    # as a multiple of the bar height, and ring radius and line width as multiples of the set ones
+    GEOMETRY = {
+        VisualType.CIRCLE: (1, 0, 1, 1, 1), # Bottom of bar on the circle, points outwards
+        VisualType.CIRCLE_INNER: (1.5, 0, -1, 1.5, 0.85), # Bottom of bar on a bigger circle, points inwards. Thinner otherwise bars overlap
+        VisualType.CIRCLE_MIDDLE: (1.5, -0.5, 0.5, 1, 1), # Middle of bar on a bigger circle, half height because bigger bars look bad
+    }
+
+    def __init__(self, center, count):
+        self.center = center
+        self.set_count(count)
+
+    def set_count(self, count):
+        self.count = count
+        self.angles = np.arange(count) * (2 * math.pi / count)
+        self.cos, self.sin = np.cos(self.angles), np.sin(self.angles)
+        self.__bases = {} # (visual_type, radius) -> base x and y of every bar
+
+    def get_direction(self, visual_type):
+        """
+        Return 1 if bars of the visual type grow outwards, -1 if inwards.
+        """
+        return 1 if self.GEOMETRY[visual_type][2] > 0 else -1
+
+    def get_ring(self, visual_type, ring_radius, width):
+        """
+        Return the radius of the ring and the width of the lines of a visual type.
+        """
+        _, _, _, ring_scale, width_scale = self.GEOMETRY[visual_type]
+        return ring_radius * ring_scale, width * width_scale
+
+    def __get_bases(self, visual_type, radius):
+        key = (visual_type, radius)
+        bases = self.__bases.get(key)
+        if bases is None:
+            distance = radius * self.GEOMETRY[visual_type][0]
+            bases = (self.center[0] + distance * self.cos, self.center[1] + distance * self.sin)
+            self.__bases = {key: bases} # Only the current type and radius are ever used
+        return bases
+
+    def get_line_ends(self, visual_type, radius, heights, bars=slice(None)):
+        """
+        Get the start and end point of every bar's line.
+
+        Args:
+            visual_type (VisualType): One of the circular types.
+            radius (float): Radius the bars are placed on.
+            heights (np.ndarray): Height of every bar, or of the bars selected.
+            bars: Index or mask of the bars to get, all by default.
+
+        Returns:
+            tuple: start_x, start_y, end_x, end_y float arrays.
+        """
+        base_x, base_y = self.__get_bases(visual_type, radius)
+        _, start, end, _, _ = self.GEOMETRY[visual_type]
+        base_x, base_y, cos, sin = base_x[bars], base_y[bars], self.cos[bars], self.sin[bars]
+        if start == 0:
+            start_x, start_y = base_x, base_y
+        else:
+            start_x, start_y = base_x + start * heights * cos, base_y + start * heights * sin
+        end_x, end_y = base_x + end * heights * cos, base_y + end * heights * sin
+        return start_x, start_y, end_x, end_y
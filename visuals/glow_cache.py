@@ -0,0 +1,84 @@
+import math
+import pygame
+from collections import OrderedDict
+
+'''
+GlowCache class keeps the surfaces glow is drawn with, so rendering glow doesn't allocate surfaces every frame.
+
+Glow of the rectangular types is drawn with pre-rendered gradient strips. A strip is the whole glow of one
+bar: passes segments of the same length, each fainter than the one before (PASSES unless lowered to save
+time). Strips are keyed by number of passes, width, segment length, color, intensity and direction. Callers round the length to LENGTH_STEP pixels and the
+color to COLOR_STEP so bars of about the same height share a strip, and the least recently used strips are
+evicted once there are more than max_strips.
+
+Blended glow of the circular types is drawn onto a layer surface that is kept between frames and added to the
+screen, which blends like alpha over a black background without drawing lines on an alpha surface.
+
+Args:
+        max_strips: maximum number of strips to keep
+'''
+class GlowCache:
+    PASSES = 4
+    LENGTH_STEP = 2
+    COLOR_STEP = 8
+
+    def __init__(self, max_strips=2048):
+        self.max_strips = max_strips
+        self.passes = self.PASSES # Segments of glow drawn past every bar
+        self.hits = 0
+        self.misses = 0
+        self.__strips = OrderedDict()
+        self.__layer = None
+
+    def __len__(self): return len(self.__strips)
+
+    def get_hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def get_strip(self, width, length, color, intensity, fade_down):
+        """
+        Get the glow strip of a bar, rendering it on a miss.
+
+        Args:
+            width (int): Width of the bar.
+            length (int): Length of each segment of the glow.
+            color (tuple): RGB color of the glow.
+            intensity (float): How much of the alpha each segment keeps from the one before, 0.1 - 0.9.
+            fade_down (bool): Whether the brightest segment is at the top (for glow below a bar) or at the bottom.
+        """
+        key = (self.passes, width, length, color, intensity, fade_down)
+        strip = self.__strips.get(key)
+        if strip is not None:
+            self.hits += 1
+            self.__strips.move_to_end(key)
+            return strip
+
+        self.misses += 1
+        strip = pygame.Surface((width, length * self.passes), pygame.SRCALPHA)
+        alpha = 32
+        for i in range(self.passes):
+            # Same alpha per segment as drawing each segment on its own: 32, then reduced by the intensity every segment
+            top = i * length if fade_down else (self.passes - 1 - i) * length
+            strip.fill((*color, math.ceil(alpha)), (0, top, width, length))
+            alpha *= intensity
+
+        self.__strips[key] = strip
+        if len(self.__strips) > self.max_strips:
+            self.__strips.popitem(last=False)
+        return strip
+
+    def get_layer(self, size):
+        """
+        Get the layer surface. It is only reallocated when the size changes, and is not cleared,
+        callers clear the part they draw on.
+        """
+        if self.__layer is None or self.__layer.get_size() != size:
+            self.__layer = pygame.Surface(size)
+        return self.__layer
+
+    def clear(self):
+        self.__strips.clear()
+        self.__layer = None
+        self.hits = 0
+        self.misses = 0
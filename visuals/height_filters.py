@@ -0,0 +1,127 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+'''
+FilterChain class runs the bar heights through a chain of filters before the bars are drawn.
+
+Every filter works on the whole height array at once:
+    SMOOTH: mixes every bar with the max and the average of its neighbors, width bars wide (wraps around)
+    DECAY: bars fall no faster than the full height in decay seconds
+    PEAK HOLD: keeps a cap at every bar's peak for hold seconds, then lets it fall
+    NOISE GATE: drops bars below gate * max height to the min height
+
+Filters run in the order they were turned on. The heights the bars move towards are left alone, the chain
+only changes the heights that are drawn, and the DECAY and PEAK HOLD filters keep their state between frames.
+'''
+class FilterChain:
+    STAGES = ("SMOOTH", "DECAY", "PEAK HOLD", "NOISE GATE")
+
+    def __init__(self):
+        self.stages = [] # Filters that are on, in order
+        self.smoothing_factor = 1.5
+        self.smoothing_width = 3
+        self.decay = 0.5
+        self.hold = 0.5
+        self.gate = 0.1
+        self.peaks = None # Cap height of every bar while PEAK HOLD is on
+        self.__previous = None # Heights drawn last frame, for DECAY
+        self.__peak_ages = None # Seconds every cap has been held
+        self.__settled = True # DECAY and PEAK HOLD didn't hold any bar or cap above the heights last frame
+
+    def is_enabled(self, stage): return stage in self.stages
+    def is_settled(self): return self.__settled
+
+    def toggle(self, stage):
+        if stage in self.stages:
+            self.stages.remove(stage)
+        else:
+            self.stages.append(stage)
+        self.__previous, self.peaks, self.__peak_ages = None, None, None # Start over from the current heights
+
+    def reset(self):
+        self.__init__()
+
+    def apply(self, heights, delta_time, min_height, max_height, skip=()):
+        """
+        Run heights through every filter that is on.
+
+        Args:
+            heights (np.ndarray): Height of every bar.
+            delta_time (float): Seconds since the last frame, 0 while paused.
+            min_height, max_height (float): Height limits of the bars.
+            skip (tuple): Filters to pass over this frame even if they are on.
+
+        Returns:
+            np.ndarray: The filtered heights, a new array if any filter is on.
+        """
+        settled = True
+        for stage in self.stages:
+            if stage in skip:
+                continue
+            if stage == "SMOOTH":
+                heights = self.__smooth(heights)
+            elif stage == "DECAY":
+                decayed = self.__decay(heights, delta_time, max_height)
+                settled = settled and np.array_equal(decayed, heights)
+                heights = decayed
+            elif stage == "PEAK HOLD":
+                self.__hold_peaks(heights, delta_time, max_height)
+                settled = settled and not np.any(self.peaks > heights)
+            elif stage == "NOISE GATE":
+                heights = np.where(heights < self.gate * max_height, min_height, heights)
+        self.__settled = settled
+        return heights
+
+    def __smooth(self, heights):
+        # Bars at the ends are neighbors of each other, like on the circular types
+        radius = self.smoothing_width // 2
+        padded = np.concatenate((heights[-radius:], heights, heights[:radius])) if radius else heights
+        average_heights = np.convolve(padded, np.full(2 * radius + 1, 1 / (2 * radius + 1)), mode="valid")
+        max_heights = sliding_window_view(padded, 2 * radius + 1).max(axis=1)
+        return np.abs(max_heights * (1 - self.smoothing_factor) + average_heights * self.smoothing_factor)
+
+    def __decay(self, heights, delta_time, max_height):
+        if self.__previous is not None and len(self.__previous) == len(heights):
+            heights = np.maximum(heights, self.__previous - max_height / self.decay * delta_time)
+        self.__previous = heights
+        return heights
+
+    def __hold_peaks(self, heights, delta_time, max_height):
+        if self.peaks is None or len(self.peaks) != len(heights):
+            self.peaks, self.__peak_ages = heights.copy(), np.zeros(len(heights))
+            return
+
+        # Caps fall at the full height per second once held long enough, and are pushed up by the bars
+        self.__peak_ages += delta_time
+        falling = self.__peak_ages > self.hold
+        self.peaks[falling] -= max_height * delta_time
+        rising = heights >= self.peaks
+        self.peaks[rising] = heights[rising]
+        self.__peak_ages[rising] = 0
+
+    def change_property(self, option, value):
+        """
+        Change a filter on button press, value 0 turns it on or off
+        """
+        if "WIDTH" in option:
+            self.smoothing_width = max(3, min(15, self.smoothing_width + value))
+        elif "SMOOTH" in option:
+            if value == 0:
+                self.toggle("SMOOTH")
+            else:
+                self.smoothing_factor = max(0.1, min(2, self.smoothing_factor + value))
+        elif "DECAY" in option:
+            if value == 0:
+                self.toggle("DECAY")
+            else:
+                self.decay = max(0.1, min(5, self.decay + value))
+        elif "PEAK" in option:
+            if value == 0:
+                self.toggle("PEAK HOLD")
+            else:
+                self.hold = max(0, min(5, self.hold + value))
+        elif "GATE" in option:
+            if value == 0:
+                self.toggle("NOISE GATE")
+            else:
+                self.gate = max(0, min(0.9, self.gate + value))
@@ -23,18 +23,17 @@ class SoundWave:
             self.__radius = min(self.__screen_w, self.__screen_h) // 2
             self.__width = 2
 
-    def update(self, decibel_level, index, color):
+    def update(self, decibel_levels, color):
         amplitude_factor = self.__screen_h // 4
 
-        # Update the specific point based on the decibel level
-        x = np.linspace(0, self.__screen_w, self.__num_points)[index]
-        y = self.__screen_h // 2 - amplitude_factor * (decibel_level / self.__num_points)
-        self.__wave_points[index] = (x, y//2)
+        # Update every point based on the decibel levels
+        x = np.linspace(0, self.__screen_w, self.__num_points)
+        y = self.__screen_h // 2 - amplitude_factor * (np.asarray(decibel_levels, dtype=float) / self.__num_points)
+        self.__wave_points = list(zip(x, y//2))
 
         self.__color = color
 
-        if index == len(self.__freq_range) - 1:
-            self.render()
+        return self.render()
 
     def render(self):
         angle_step = 2 * math.pi / self.__num_points
@@ -46,4 +45,4 @@ class SoundWave:
             )
             for i, (x, y) in enumerate(self.__wave_points)
         ]
-        pygame.draw.lines(self.__screen, self.__color, True, circle_points, self.__width)
+        return pygame.draw.lines(self.__screen, self.__color, True, circle_points, self.__width)
@@ -1,81 +1,13 @@
 import pygame
 import random
-import math
-
-'''
-Spark class responsible for rendering and updating the spark
-'''
-class Spark:
-    def __init__(self, x, y, velocity_x, velocity_y, size, fade_rate, velocity_rate, gravity, color, swade, shape = "circle"):
-        self.__x, self.__y = x, y
-        self.__velocity_x, self.__velocity_y = velocity_x, velocity_y
-        self.__size = size 
-        self.__fade_rate = fade_rate
-        self.__velocity_rate = velocity_rate
-        self.__gravity = gravity
-        self.__color = pygame.Color(color)
-        self.__swade = swade
-        self.shape = shape
-
-        self.__swade_direction = random.choice([True, False])
-        self.__fade_rate_sum = 0
-        self.__swade_sum = 0
-        self.__active = True
-        
-    def update(self, delta_time, screen_w, screen_h):
-        """
-        Update the spark's position and color over time.
-        Apply gravity and fade the spark's color towards black.
-        Deactivate the spark if it goes out of bounds or fades to black.
-        """
-        # Apply gravity to the spark
-        self.__velocity_y += self.__gravity
-
-        # Update the spark position
-        self.__x += self.__velocity_x
-        self.__y += self.__velocity_y
-
-        # Make spark randomly swade back and fourth smoothly
-        if self.__swade:
-            if self.__swade_direction:
-                self.__swade_sum += random.uniform(0, 0.01)
-            else:
-                self.__swade_sum -= random.uniform(0, 0.01)
-            if random.random() <= 0.05:
-                self.__swade_direction = not self.__swade_direction
-                self.__swade_sum = 0
-        
-        self.__x += self.__swade_sum
-        self.__y += self.__swade_sum
-
-        self.__fade_rate_sum += self.__fade_rate
-
-        # Fade towards black
-        r, g, b, a = self.__color
-        r = max(0, r - self.__fade_rate_sum)
-        g = max(0, g - self.__fade_rate_sum)
-        b = max(0, b - self.__fade_rate_sum)
-        self.__color = pygame.Color(math.ceil(r), math.ceil(g), math.ceil(b), math.ceil(a))
-
-        # Deactivate the spark if it is fully black or outside of the display
-        if ((self.__y < 0 or self.__y > screen_h or self.__x < 0 or self.__x > screen_w) or 
-            (self.__color.r == 0 and self.__color.g == 0 and self.__color.b == 0)):
-            self.__active = False
-
-    def is_active(self):
-        return self.__active
-
-    def render(self, screen):
-        if self.shape == "rect":
-            pygame.draw.rect(screen, self.__color, (self.__x, self.__y, self.__size, self.__size))
-        elif self.shape == "circle":
-            pygame.draw.circle(screen, self.__color, (self.__x, self.__y), self.__size)
+import numpy as np
+from visuals.sprite_cache import SpriteCache
 
 '''
 SparkProperties class responsible for holding behavior properties of spark
 '''
 class SparkProperties:
-    def __init__(self, limit=2, spawn_rate=50, velocity_rate=1, gravity=0, size=1.5, fade_rate=0.05, swade=False, threshold = 0.05):
+    def __init__(self, limit=400, spawn_rate=50, velocity_rate=1, gravity=0, size=1.5, fade_rate=0.05, swade=False, threshold = 0.05):
         self.limit = limit
         self.spawn_rate = spawn_rate
         self.velocity_rate = velocity_rate
@@ -102,51 +34,211 @@ class SparkProperties:
         self.random_swade = False
 
     def randomize_properties(self):
-        if self.random_limit: self.limit = random.uniform(1, 10)
+        if self.random_limit: self.limit = random.uniform(50, 2000)
         if self.random_spawn: self.spawn_rate = random.uniform(0, 500)
-        if self.random_velocity: self.velocity_rate = random.uniform(0.1, 2)
-        if self.random_gravity: self.gravity = random.uniform(0, 0.01)
-        if self.random_size: self.size = random.uniform(1, 4)
-        if self.random_fade: self.fade_rate = random.uniform(0, 0.1)
-        if self.random_swade: self.swade = random.choice([True, False])
+
+    def sample(self, count):
+        """
+        Get the velocity rate, gravity, size, fade rate and swade of count new sparks.
+        Randomized properties get a new random value for every spark.
+        """
+        def pick(random_value, low, high, value):
+            return np.random.uniform(low, high, count) if random_value else np.full(count, float(value))
+
+        velocity_rate = pick(self.random_velocity, 0.1, 2, self.velocity_rate)
+        gravity = pick(self.random_gravity, 0, 0.01, self.gravity)
+        size = pick(self.random_size, 1, 4, self.size)
+        fade_rate = pick(self.random_fade, 0, 0.1, self.fade_rate)
+        swade = np.random.random(count) < 0.5 if self.random_swade else np.full(count, bool(self.swade))
+        return velocity_rate, gravity, size, fade_rate, swade
 
 '''
-SparkManager Class responsible for cerating, holding, and deleting multiple sparks at a time
+SparkPool class holds every spark of the visualizer in one set of NumPy arrays.
+
+Spark i lives in row i of every array and only the first count rows are live. Moving and fading is done
+for all sparks at once, and dead sparks are swapped out for live ones from the end of the arrays, so the
+live sparks always stay packed at the front. The arrays are allocated once with room for CAPACITY sparks.
+Sparks are drawn by blitting pre-rendered sprites from a SpriteCache, all in one Surface.fblits call.
+
+properties.limit is the budget of live sparks for the whole visualizer. When new sparks would go over it the
+dimmest sparks are evicted first, since they are the closest to fading out anyway, and if the new sparks
+alone go over it only the first ones (the strongest, when the caller sorts them) are created. budget_scale
+lowers the budget below the limit without changing it, for when the frame rate can't keep up.
 '''
-class SparkManager:
+class SparkPool:
+    CAPACITY = 4096
+    COLOR_STEP = 8
+
     def __init__(self):
         self.properties = SparkProperties()
-        self.sparks = []
-        self.spark_ticks = self.properties.spawn_rate # Time between each spark creation
         self.gen_sparks = False
+        self.shape = "circle"
+        self.additive = False # Add the sparks' colors to the screen instead of drawing over it
+        self.sprites = SpriteCache()
+        self.budget_scale = 1 # Part of properties.limit that may be live
+        self.count = 0
+
+        self.x = np.zeros(self.CAPACITY)
+        self.y = np.zeros(self.CAPACITY)
+        self.velocity_x = np.zeros(self.CAPACITY)
+        self.velocity_y = np.zeros(self.CAPACITY)
+        self.gravity = np.zeros(self.CAPACITY)
+        self.size = np.zeros(self.CAPACITY)
+        self.colors = np.zeros((self.CAPACITY, 3)) # RGB, fades towards black
+        self.fade_rate = np.zeros(self.CAPACITY)
+        self.fade_sum = np.zeros(self.CAPACITY) # Fade speeds up every frame
+        self.swade = np.zeros(self.CAPACITY, dtype=bool)
+        self.swade_direction = np.zeros(self.CAPACITY, dtype=bool)
+        self.swade_sum = np.zeros(self.CAPACITY)
+        self.__arrays = [self.x, self.y, self.velocity_x, self.velocity_y, self.gravity, self.size, self.colors,
+                         self.fade_rate, self.fade_sum, self.swade, self.swade_direction, self.swade_sum]
 
-    def create_spark(self, x, y, velocity_x, velocity_y, color):
+    def __len__(self): return self.count
+
+    def get_budget(self):
+        return min(self.CAPACITY, int(self.properties.limit * self.budget_scale))
+
+    def create_sparks(self, x, y, direction_x, direction_y, color):
+        """
+        Create one spark at every position, flying in its direction at the velocity rate.
+
+        Args:
+            x, y (np.ndarray): Start positions.
+            direction_x, direction_y (np.ndarray): Direction the sparks fly in, multiplied by the velocity rate.
+            color (pygame.Color): Start color of the sparks.
+
+        Returns:
+            int: Number of sparks created, less than asked for when they don't fit in the budget.
+        """
         self.properties.randomize_properties() # Will randomize any properties that have their random value as true
-        self.sparks.append(Spark(
-            x, y, velocity_x, velocity_y,
-            self.properties.size, self.properties.fade_rate,
-            self.properties.velocity_rate, self.properties.gravity,
-            color, self.properties.swade
-        ))
+        budget = self.get_budget()
+        new = min(len(x), budget)
+        if new == 0:
+            return 0
+        self.__evict(self.count + new - budget)
+
+        velocity_rate, gravity, size, fade_rate, swade = self.properties.sample(new)
+        rows = slice(self.count, self.count + new)
+        self.x[rows], self.y[rows] = x[:new], y[:new]
+        self.velocity_x[rows] = direction_x[:new] * velocity_rate
+        self.velocity_y[rows] = direction_y[:new] * velocity_rate
+        self.gravity[rows] = gravity
+        self.size[rows] = size
+        self.colors[rows] = (color.r, color.g, color.b)
+        self.fade_rate[rows] = fade_rate
+        self.fade_sum[rows] = 0
+        self.swade[rows] = swade
+        self.swade_direction[rows] = np.random.random(new) < 0.5
+        self.swade_sum[rows] = 0
+        self.count += new
+        return new
 
     def update_sparks(self, delta_time, screen_w, screen_h):
-        if self.gen_sparks:
-            for spark in self.sparks:
-                spark.update(delta_time, screen_w, screen_h)
-                if not spark.is_active():
-                    self.sparks.remove(spark)
+        """
+        Move every spark, apply gravity and fade them towards black.
+        Remove the sparks that went outside of the display or are fully black.
+        """
+        if not self.gen_sparks:
+            return
+        self.__evict(self.count - self.get_budget()) # The budget may have been lowered
+        n = self.count
+        if n == 0:
+            return
+
+        self.velocity_y[:n] += self.gravity[:n]
+        self.x[:n] += self.velocity_x[:n]
+        self.y[:n] += self.velocity_y[:n]
+
+        # Make sparks randomly swade back and fourth smoothly
+        swade = self.swade[:n]
+        if swade.any():
+            step = np.random.uniform(0, 0.01, n)
+            self.swade_sum[:n] += np.where(swade, np.where(self.swade_direction[:n], step, -step), 0)
+            flip = swade & (np.random.random(n) <= 0.05)
+            self.swade_direction[:n] ^= flip
+            self.swade_sum[:n][flip] = 0
+            self.x[:n] += self.swade_sum[:n]
+            self.y[:n] += self.swade_sum[:n]
+
+        # Fade towards black
+        self.fade_sum[:n] += self.fade_rate[:n]
+        colors = self.colors[:n]
+        np.ceil(np.maximum(0, colors - self.fade_sum[:n, None]), out=colors)
+
+        # Remove sparks that are fully black or outside of the display
+        x, y = self.x[:n], self.y[:n]
+        dead = (y < 0) | (y > screen_h) | (x < 0) | (x > screen_w) | ~colors.any(axis=1)
+        self.__remove(np.flatnonzero(dead))
 
     def render_sparks(self, screen):
-        if self.gen_sparks:
-            for spark in self.sparks:
-                spark.render(screen)
-    
+        """
+        Blit every spark from the sprite cache in one call. Sizes are rounded to half a pixel and colors
+        to steps of COLOR_STEP so sparks that look the same share a sprite.
+
+        Returns:
+            pygame.Rect: Rectangle around the sparks drawn, None if there were none.
+        """
+        if not self.gen_sparks or self.count == 0:
+            return None
+        n = self.count
+        colors = np.minimum(255, np.round(self.colors[:n] / self.COLOR_STEP) * self.COLOR_STEP).astype(np.int64)
+        sizes = np.round(self.size[:n] * 2).astype(np.int64)
+        keys = (sizes << 24) | (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+
+        # Look up each distinct sprite once, then hand every spark its sprite
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        sprites, offsets = np.empty(len(unique_keys), dtype=object), np.empty(len(unique_keys))
+        for i, key in enumerate(unique_keys.tolist()):
+            sprites[i], offsets[i] = self.sprites.get(self.shape, (key >> 24) / 2, key & 0xFFFFFF)
+
+        dest_x = (self.x[:n] + offsets[inverse]).astype(int).tolist()
+        dest_y = (self.y[:n] + offsets[inverse]).astype(int).tolist()
+        flags = pygame.BLEND_RGB_ADD if self.additive else 0
+        screen.fblits(list(zip(sprites[inverse].tolist(), zip(dest_x, dest_y))), flags)
+
+        reach = int(self.size[:n].max()) + 2
+        left, top = min(dest_x), min(dest_y)
+        return pygame.Rect(left, top, max(dest_x) - left + 2 * reach, max(dest_y) - top + 2 * reach)
+
+    def clear(self):
+        self.count = 0
+
+    def __evict(self, count):
+        """
+        Remove the count dimmest sparks.
+        """
+        if count <= 0:
+            return
+        if count >= self.count:
+            self.count = 0
+            return
+        brightness = self.colors[:self.count].max(axis=1)
+        self.__remove(np.argpartition(brightness, count - 1)[:count])
+
+    def __remove(self, rows):
+        """
+        Remove the sparks in rows by moving the live sparks from the end of the arrays into their place.
+        """
+        if len(rows) == 0:
+            return
+        count = self.count - len(rows)
+        removed = np.zeros(self.count, dtype=bool)
+        removed[rows] = True
+        holes = np.flatnonzero(removed[:count]) # Removed rows that have to be filled
+        movers = np.flatnonzero(~removed[count:]) + count # Live rows past the new end
+        for array in self.__arrays:
+            array[holes] = array[movers]
+        self.count = count
+
     # Update spark property based on option selected
     # If they were randomized but then not, set it to the original value so that all sparks are in sync
     # Otherwise they would start from their last random value
     def change_spark_property(self, option, value):
         
-        if "LIMIT" in option:
+        if "ADDITIVE" in option:
+            self.additive = not self.additive
+
+        elif "LIMIT" in option:
             if value == 0: self.properties.random_limit = True
             else: 
                 if self.properties.random_limit:
@@ -208,7 +300,8 @@ class SparkManager:
 
         elif "RESET" in option:
             self.properties.__init__()
-            self.sparks = []
+            self.additive = False
+            self.clear()
             self.gen_sparks = False
 
         elif "SPARK" in option:
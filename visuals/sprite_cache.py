@@ -0,0 +1,72 @@
+import pygame
+from collections import OrderedDict
+
+'''
+SpriteCache class keeps pre-rendered spark sprites so sparks can be blitted instead of drawn one by one.
+
+Sprites are keyed by shape, size and color. Callers quantize the size and color first so sparks that look
+the same share one sprite. The background of a sprite is black and set as its colorkey, which also makes it
+work as is with additive blending, where black adds nothing. The least recently used sprites are evicted
+once there are more than max_sprites.
+
+Args:
+        max_sprites: maximum number of sprites to keep
+'''
+class SpriteCache:
+    def __init__(self, max_sprites=1024):
+        self.max_sprites = max_sprites
+        self.hits = 0
+        self.misses = 0
+        self.__sprites = OrderedDict()
+
+    def __len__(self): return len(self.__sprites)
+
+    def get_hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def get(self, shape, size, color):
+        """
+        Get the sprite of a spark, rendering it on a miss.
+
+        Args:
+            shape (str): "circle" or "rect".
+            size (float): Radius of a circle or side of a rect.
+            color (int): 0xRRGGBB color.
+
+        Returns:
+            tuple: The sprite and the offset from the spark's position to the sprite's top left corner.
+        """
+        key = (shape, size, color)
+        sprite = self.__sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self.__sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = self.__render(shape, size, color)
+        self.__sprites[key] = sprite
+        if len(self.__sprites) > self.max_sprites:
+            self.__sprites.popitem(last=False)
+        return sprite
+
+    def __render(self, shape, size, color):
+        color = pygame.Color((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+        if shape == "rect":
+            side = max(1, int(size))
+            surface = pygame.Surface((side, side))
+            surface.fill(color)
+            offset = 0
+        else:
+            radius = max(1, int(size + 1))
+            surface = pygame.Surface((2 * radius + 1, 2 * radius + 1))
+            pygame.draw.circle(surface, color, (radius, radius), size)
+            offset = -radius
+        surface.set_colorkey((0, 0, 0)) # Not RLEACCEL, RLE sprites are several times slower to blit additively
+        return surface, offset
+
+    def clear(self):
+        self.__sprites.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,21 +1,32 @@
 import pygame
 import numpy as np
-import math
-from visuals.audio_bar import AudioBar
+from visuals.bar_engine import BarEngine
+from visuals.height_filters import FilterChain
 from visuals.sound_wave import SoundWave
 from visuals.visual_type import VisualType
 
 '''
-Visualizer class creates audio bars and tells the audio bars and sparks how to behave
+Visualizer class creates the audio bars and tells the audio bars and sparks how to behave
 
 Future visual types might need a differnt class than audio bars (like waves)
 
 Args:
         screen: screen to draw/Visual on
         screen_w, screen_h: width and height of screen
+        freq_range: center frequency of each band, one bar per band (see components.BandLayout)
 '''
 class Visualizer:
-    def __init__(self, screen, screen_w, screen_h):
+    # Quality tiers from best to fastest, lowered when frames take too long (see components.QualityGovernor):
+    # name, part of the spark limit that may be live, glow passes, whether the SMOOTH filter runs, bands per bar
+    QUALITY_TIERS = (
+        ("FULL", 1, 4, True, 1),
+        ("HIGH", 0.5, 3, True, 1),
+        ("MEDIUM", 0.25, 2, False, 1),
+        ("LOW", 0.1, 1, False, 2),
+        ("MINIMUM", 0, 0, False, 3),
+    )
+
+    def __init__(self, screen, screen_w, screen_h, freq_range):
         self.__screen = screen
         self.__screen_w = screen_w
         self.__screen_h = screen_h
@@ -24,35 +35,50 @@ class Visualizer:
         self.__hue = 0
         self.__color_cycle = False
         self.__color_speed = 0.5
-        self.__smooth_enabled = False
         self.__rotation_enabled = False
         self.__rotate_ticks = 0
-        self.__smoothing_factor = 1.5
         self.__rotate_speed = 10
+        self.filters = FilterChain()
+        self.quality = 0 # Index into QUALITY_TIERS
+        self.__skip_filters = ()
+        self.__frozen = False # Last update was paused, nothing but the rotation moved
 
-        self.freq_range = np.arange(200, 8000, 50) # Determines number of bars
-        self.bars = self.__create_audio_bars()
+        self.freq_range = np.asarray(freq_range) # Determines number of bars
+        self.bars = BarEngine(screen, screen_w, screen_h, self.freq_range, min(screen_w, screen_h) // 4, self.__visual_type)
         self.sound_wave = SoundWave(screen, screen_w, screen_h, self.freq_range,  self.__color)
     
     # Getters for displaying info in button menu
     def get_color_speed(self): return self.__color_speed
-    def get_smoothing_factor(self): return self.__smoothing_factor
+    def get_filters(self): return self.filters
     def get_rotate_speed(self): return self.__rotate_speed
-    def get_bar_info(self): return self.bars[0]
-
-    def __create_audio_bars(self):
-        bars = []
-        radius = min(self.__screen_w, self.__screen_h) // 4  # Radius from center of display
-        bar_width = (self.__screen_w / len(self.freq_range)) # Make sure all bars can fit on screen horizontaly
-        angle_step = 2 * math.pi / len(self.freq_range)  # Change in angle between each bar
-        x = 0 # X position for horizontal bars
+    def get_bar_info(self): return self.bars
+    def get_quality(self): return self.QUALITY_TIERS[self.quality][0]
 
-        for i, freq in enumerate(self.freq_range):
-            angle = i * angle_step # Update angle
-            bars.append(AudioBar(self.__screen, self.__screen_w, self.__screen_h, x, self.__screen_h//2, freq, width=bar_width, angle=angle, radius=radius, visual_type=self.__visual_type))
-            x += bar_width
+    def set_quality(self, tier):
+        """
+        Switch to a tier of QUALITY_TIERS. Menu settings are left as they are, tiers only hold back what is drawn.
+        """
+        self.quality = tier
+        _, spark_scale, glow_passes, smoothing, bar_step = self.QUALITY_TIERS[tier]
+        self.bars.sparks.budget_scale = spark_scale
+        self.bars.glow.passes = glow_passes
+        self.__skip_filters = () if smoothing else ("SMOOTH",)
+        self.bars.set_bar_step(bar_step)
 
-        return bars
+    def is_still(self):
+        """
+        Return True if drawing the same levels again gives the same picture: no sparks are flying, bars don't rotate,
+        and unless paused, the color doesn't cycle, the bars reached their levels and the filters let go of them.
+        """
+        if self.bars.sparks.count or self.__rotation_enabled:
+            return False
+        if self.__frozen:
+            return True
+        if self.__color_cycle:
+            return False
+        if self.__visual_type == VisualType.CIRCLE_WAVE:
+            return True
+        return self.bars.is_settled() and self.filters.is_settled()
 
     def __update_color_cycle(self, delta_time):
         """
@@ -64,72 +90,39 @@ class Visualizer:
         hsva = (int(self.__hue), 100, 100, 100)
         self.__color.hsva = hsva
 
-    # Shift bars array by 1 and resest tick counter
+    # Shift the bands over by 1 bar and resest tick counter
     def __rotate_bars(self):
         self.__rotate_ticks = 0
-        n = len(self.bars)
-        self.bars = self.bars[-1 % n:] + self.bars[:-1 % n]
-
-    # Adjusts the bar heights based on the max hieght of its neighbors
-    def __smooth_bars(self):
-        
-        n = len(self.bars)
-        new_heights = np.array([bar.height for bar in self.bars])
-
-        for i in range(n):
-            
-            # Get the index and height of previous, current, and next bar
-            neighbor_indices = [(i - 1) % n, i, (i + 1) % n]
-            neighbor_heights = [self.bars[j].height for j in neighbor_indices]
-
-            average_height = sum(neighbor_heights) / len(neighbor_heights)
-
-            max_height = max(neighbor_heights)
-            
-            new_heights[i] = abs(max_height  * (1 - self.__smoothing_factor) + average_height * self.__smoothing_factor)
-
-        for i in range(n):
-            self.bars[i].height = new_heights[i]
-            self.bars[i].render()
+        self.bars.rotate()
     
     def change_visual_type(self, visual_type): 
         self.__visual_type = visual_type
-        for bar in self.bars:
-                bar.set_type(self.__visual_type)
+        self.bars.set_type(self.__visual_type)
 
     def change_property(self, option, value):
         if self.__visual_type in [VisualType.BOTTOM, VisualType.TOP, VisualType.MIDDLE, VisualType.CIRCLE, VisualType.CIRCLE_INNER, VisualType.CIRCLE_MIDDLE]:
-            for bar in self.bars:
-                bar.change_bar_properties(option, value)
+            self.bars.change_bar_properties(option, value)
         else:
             self.sound_wave.change_wave_property(option, value)
     
     def change_spark_property(self, option, value):
-        for bar in self.bars:
-                bar.spark_manager.change_spark_property(option, value)
+        self.bars.change_spark_property(option, value)
     
     # Change special property which requires the bars to share info with eachother
+    # Smoothing, decay, peak hold and noise gate are filters in the FilterChain
     def change_special_property(self, option, value):
         if "ROTATION" in option:
             if value == 0:
                 self.__rotation_enabled = not self.__rotation_enabled
             else:
                 self.__rotate_speed = max (1, self.__rotate_speed + value)
-        elif "SMOOTH" in option:
-            if value == 0:
-                self.__smooth_enabled = not self.__smooth_enabled
-                for bar in self.bars:
-                    bar.__smooth_enabled = self.__smooth_enabled
-            else:
-                self.__smoothing_factor = max (0.1, min(2, self.__smoothing_factor + value))
         elif "RESET" in option:
             self.__rotation_enabled = False
             self.__rotate_speed = 10
-            self.__smooth_enabled = False
-            self.__smoothing_factor = 1.5
-            self.bars.sort(key=lambda bar: bar.freq) # Reset to original order if rotated
-            for bar in self.bars:
-                    bar.__smooth_enabled = False
+            self.filters.reset()
+            self.bars.reset_rotation() # Reset to original order if rotated
+        else:
+            self.filters.change_property(option, value)
 
     def change_color_property(self, option, value):
         if "CYCLE ON/OFF" in option:
@@ -138,33 +131,29 @@ class Visualizer:
             self.__color_speed = max(0.1, self.__color_speed + value)
         elif "CHANGE COLOR" in option:
             self.__color = pygame.Color(value)
-            for bar in self.bars:
-                bar.__color = value
         elif "GLOW ON/OFF" in option:
-            for bar in self.bars:
-                bar.glow_enabled = not bar.glow_enabled
+            self.bars.glow_enabled = not self.bars.glow_enabled
+        elif "GLOW BLEND" in option:
+            self.bars.glow_blend = not self.bars.glow_blend
         elif "GLOW INTENSITY" in option:
-            for bar in self.bars:
-                bar.glow_intensity = (max(0.1, (min(0.9, bar.glow_intensity + value))))
+            self.bars.glow_intensity = (max(0.1, (min(0.9, self.bars.glow_intensity + value))))
         elif "GLOW LENGTH" in option:
-            for bar in self.bars:
-                bar.glow_length = (max(0.1, (min(0.9, bar.glow_length + value))))
+            self.bars.glow_length = (max(0.1, (min(0.9, self.bars.glow_length + value))))
         elif "RESET" in option:
             self.__color_cycle = False
             self.__color_speed = 0.5
             self.__color = pygame.Color(255,255,255)
-            for bar in self.bars:
-                bar.glow_length = 0.2
-                bar.glow_intensity = 0.5
-                bar.glow_enabled = False
+            self.bars.glow_length = 0.2
+            self.bars.glow_intensity = 0.5
+            self.bars.glow_enabled = False
+            self.bars.glow_blend = False
             self.change_special_property("SMOOTHING", 0)
     
     def change_preset(self, option):
         
-        for bar in self.bars:
-            bar.change_bar_properties("RESET BARS", 0)
-            bar.change_bar_properties("RESET CIRCLE", 0)
-            bar.spark_manager.change_spark_property("RESET SPARKS", 0)
+        self.bars.change_bar_properties("RESET BARS", 0)
+        self.bars.change_bar_properties("RESET CIRCLE", 0)
+        self.bars.change_spark_property("RESET SPARKS", 0)
         self.change_color_property("RESET COLORS", 0)
         self.change_special_property("RESET", 0)
         self.__color = pygame.Color(255,255,255)
@@ -172,51 +161,48 @@ class Visualizer:
 
         if "BLACK HOLE" in option:
             self.change_visual_type(VisualType.CIRCLE_INNER)
-            for bar in self.bars:
-                bar.change_bar_properties("BAR WIDTH", -1)
-                bar.change_bar_properties("MAX HEIGHT", -40)
-                bar.change_bar_properties("RING RADIUS", -175)
-                bar.change_bar_properties("RING WIDTH",-0.05 )
-                bar.spark_manager.change_spark_property("SPARK", 0)
-                bar.spark_manager.change_spark_property("RANDOM LIMIT", 0)
-                bar.spark_manager.change_spark_property("SPAWN RATE", 50)
-                bar.spark_manager.change_spark_property("RANDOM SIZE", 0)
-                bar.spark_manager.change_spark_property("FADE", -0.035)
-                bar.spark_manager.change_spark_property("VELOCITY", 0.2)
+            self.bars.change_bar_properties("BAR WIDTH", -1)
+            self.bars.change_bar_properties("MAX HEIGHT", -40)
+            self.bars.change_bar_properties("RING RADIUS", -175)
+            self.bars.change_bar_properties("RING WIDTH",-0.05 )
+            self.bars.change_spark_property("SPARK", 0)
+            self.bars.change_spark_property("RANDOM LIMIT", 0)
+            self.bars.change_spark_property("SPAWN RATE", 50)
+            self.bars.change_spark_property("RANDOM SIZE", 0)
+            self.bars.change_spark_property("FADE", -0.035)
+            self.bars.change_spark_property("VELOCITY", 0.2)
             self.change_color_property("CHANGE COLOR", (230, 230, 230))
 
         elif "SPACE" in option:
             self.change_visual_type(VisualType.MIDDLE)
-            for bar in self.bars:
-                bar.change_bar_properties("BAR WIDTH", -1)
-                bar.spark_manager.change_spark_property("SPARK", 0)
-                bar.spark_manager.change_spark_property("RANDOM LIMIT", 0)
-                bar.spark_manager.change_spark_property("RANDOM SPAWN", 0)
-                bar.spark_manager.change_spark_property("RANDOM SIZE", 0)
-                bar.spark_manager.change_spark_property("FADE", -0.04)
-                bar.spark_manager.change_spark_property("RANDOM VELOCITY", 0)
-                bar.spark_manager.change_spark_property("HEIGHT THRESHOLD", 0.1)
-                bar.glow_intensity = 0.6
-                bar.glow_length = 0.1
+            self.bars.change_bar_properties("BAR WIDTH", -1)
+            self.bars.change_spark_property("SPARK", 0)
+            self.bars.change_spark_property("RANDOM LIMIT", 0)
+            self.bars.change_spark_property("RANDOM SPAWN", 0)
+            self.bars.change_spark_property("RANDOM SIZE", 0)
+            self.bars.change_spark_property("FADE", -0.04)
+            self.bars.change_spark_property("RANDOM VELOCITY", 0)
+            self.bars.change_spark_property("HEIGHT THRESHOLD", 0.1)
+            self.bars.glow_intensity = 0.6
+            self.bars.glow_length = 0.1
             self.change_special_property("SMOOTHING", 0)
             self.change_special_property("SMOOTHING", 0.5)
             self.change_color_property("GLOW ON/OFF", 0)
             
         elif "FIRE" in option:
             self.change_visual_type(VisualType.BOTTOM)
-            for bar in self.bars:
-                bar.change_bar_properties("MAX HEIGHT", 50)
-                bar.change_bar_properties("GROW SPEED", -0.01)
-                bar.change_bar_properties("SHRINK SPEED", -0.01)
-                bar.spark_manager.change_spark_property("SPARK", 0)
-                bar.spark_manager.change_spark_property("RANDOM LIMIT", 0)
-                bar.spark_manager.change_spark_property("SPAWN RATE", 50)
-                bar.spark_manager.change_spark_property("RANDOM FADE", 0)
-                bar.spark_manager.change_spark_property("RANDOM GRAVITY", 0)
-                bar.spark_manager.change_spark_property("RANDOM VELOCITY", 0)
-                bar.spark_manager.change_spark_property("SWADE", True)
-                bar.glow_intensity = 0.6
-                bar.glow_length = 0.3
+            self.bars.change_bar_properties("MAX HEIGHT", 50)
+            self.bars.change_bar_properties("GROW SPEED", -0.01)
+            self.bars.change_bar_properties("SHRINK SPEED", -0.01)
+            self.bars.change_spark_property("SPARK", 0)
+            self.bars.change_spark_property("RANDOM LIMIT", 0)
+            self.bars.change_spark_property("SPAWN RATE", 50)
+            self.bars.change_spark_property("RANDOM FADE", 0)
+            self.bars.change_spark_property("RANDOM GRAVITY", 0)
+            self.bars.change_spark_property("RANDOM VELOCITY", 0)
+            self.bars.change_spark_property("SWADE", True)
+            self.bars.glow_intensity = 0.6
+            self.bars.glow_length = 0.3
             self.change_color_property("CHANGE COLOR", (255, 90, 0))
             self.change_color_property("GLOW ON/OFF", 0)
             self.change_special_property("SMOOTHING", 0)
@@ -225,18 +211,17 @@ class Visualizer:
 
         elif "LIGHT SHOW" in option:
             self.change_visual_type(VisualType.CIRCLE)
-            for bar in self.bars:
-                bar.change_bar_properties("MAX HEIGHT", -50)
-                bar.change_bar_properties("GROW SPEED", -0.03)
-                bar.change_bar_properties("SHRINK SPEED", -0.03)
-                bar.spark_manager.change_spark_property("SPARK", 0)
-                bar.spark_manager.change_spark_property("SPAWN RATE", 50)
-                bar.spark_manager.change_spark_property("RANDOM SIZE", 0)
-                bar.spark_manager.change_spark_property("FADE", -0.025)
-                bar.spark_manager.change_spark_property("GRAVITY", 0.012)
-                bar.spark_manager.change_spark_property("RANDOM VELOCITY", 0)
-                bar.spark_manager.change_spark_property("HEIGHT THRESHOLD", 0.25)
-                bar.glow_length = 0.2
+            self.bars.change_bar_properties("MAX HEIGHT", -50)
+            self.bars.change_bar_properties("GROW SPEED", -0.03)
+            self.bars.change_bar_properties("SHRINK SPEED", -0.03)
+            self.bars.change_spark_property("SPARK", 0)
+            self.bars.change_spark_property("SPAWN RATE", 50)
+            self.bars.change_spark_property("RANDOM SIZE", 0)
+            self.bars.change_spark_property("FADE", -0.025)
+            self.bars.change_spark_property("GRAVITY", 0.012)
+            self.bars.change_spark_property("RANDOM VELOCITY", 0)
+            self.bars.change_spark_property("HEIGHT THRESHOLD", 0.25)
+            self.bars.glow_length = 0.2
             self.change_color_property("CYCLE ON/OFF", 0)
             self.change_color_property("GLOW ON/OFF", 0)
             self.change_special_property("ROTATION", 0)
@@ -244,35 +229,47 @@ class Visualizer:
 
         elif "RAIN" in option:
             self.change_visual_type(VisualType.TOP)
-            for bar in self.bars:
-                bar.change_bar_properties("WIDTH", -1)
-                bar.spark_manager.change_spark_property("SPARK", 0)
-                bar.spark_manager.change_spark_property("RANDOM LIMIT", 0)
-                bar.spark_manager.change_spark_property("RANDOM SIZE", 0)
-                bar.spark_manager.change_spark_property("FADE", -0.45)
-                bar.spark_manager.change_spark_property("GRAVITY", 0.015)
-                bar.spark_manager.change_spark_property("RANDOM VELOCITY", 0)
+            self.bars.change_bar_properties("WIDTH", -1)
+            self.bars.change_spark_property("SPARK", 0)
+            self.bars.change_spark_property("RANDOM LIMIT", 0)
+            self.bars.change_spark_property("RANDOM SIZE", 0)
+            self.bars.change_spark_property("FADE", -0.45)
+            self.bars.change_spark_property("GRAVITY", 0.015)
+            self.bars.change_spark_property("RANDOM VELOCITY", 0)
             self.change_color_property("CHANGE COLOR", (0, 91, 227))
           
-    def update(self, delta_time, decibel, i):
+    def update(self, delta_time, decibels, onsets=None):
+        """
+        Update every bar, or the sound wave, with the decibel levels of one frame.
 
+        Args:
+            delta_time (float): Seconds since the last frame.
+            decibels (np.ndarray): Decibel level of every frequency in freq_range.
+            onsets (tuple): Band index and strength (dB) arrays of the onsets since the last frame, they make bars spark.
+
+        Returns:
+            list: Rectangles drawn on, for updating only those parts of the display.
+        """
+        self.__frozen = delta_time == 0
         if self.__color_cycle:
-            self.__update_color_cycle(delta_time)
+            # The hue advances by color_speed per band every frame
+            self.__update_color_cycle(delta_time * len(self.freq_range))
 
         if self.__visual_type not in [VisualType.CIRCLE_WAVE]:
-            self.bars[i].update(delta_time, decibel, self.__color)
+            # Strongest onset of every band this frame, 0 for none
+            strengths = np.zeros(len(self.freq_range))
+            if onsets is not None:
+                np.maximum.at(strengths, onsets[0], onsets[1])
+
+            self.bars.update(delta_time, decibels, self.__color, strengths)
+
+            # Only rotate and filter after all bars have been updated, then draw each bar once
+            if self.__rotation_enabled:
+                if self.__rotate_ticks > self.__rotate_speed:
+                    self.__rotate_bars()
+                self.__rotate_ticks+=1
+            self.bars.apply_filters(self.filters, delta_time, self.__skip_filters)
+            return self.bars.render()
 
-            # Only rotate and smooth after all bars have been updated
-            if i == len(self.bars) - 1:
-                if self.__rotation_enabled:
-                    if self.__rotate_ticks > self.__rotate_speed:
-                        self.__rotate_bars()
-                    self.__rotate_ticks+=1
-                if self.__smooth_enabled:
-                    self.__smooth_bars()
-        
         else:
-            self.sound_wave.update(decibel, i, self.__color)
-        
-                        
-        
\ No newline at end of file
+            return [self.sound_wave.update(decibels, self.__color)]